@@ -0,0 +1,57 @@
+"""
+Benchmark of the diagram model serialization.
+
+Serializes a 100k step sequence diagram by building the whole text then
+deflating it, against streaming its lines through the deflater and into a
+file as ``PlantUML.process_lines`` and ``Diagram.write_to`` do, reporting
+the time and peak memory of each.
+
+Usage:
+    python -m plantumlapi.benchmarks.bench_diagrams
+"""
+
+import os
+import time
+import tracemalloc
+from zlib import DEFLATED, MAX_WBITS, compressobj
+
+from plantumlapi.plantumlapi.diagrams import SequenceDiagram
+from plantumlapi.plantumlapi.encoding import deflate, iter_chunks
+
+STEPS = 100_000
+
+
+def whole_text(diagram):
+    return len(deflate(diagram.text()))
+
+
+def streamed(diagram):
+    deflater = compressobj(-1, DEFLATED, -MAX_WBITS)
+    size = sum(len(deflater.compress(chunk.encode('utf-8'))) for chunk in iter_chunks(diagram.draw()))
+    return size + len(deflater.flush())
+
+
+def write_to(diagram):
+    with open(os.devnull, 'w') as out:
+        diagram.write_to(out)
+
+
+def measure(fn, diagram):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(diagram)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    diagram = SequenceDiagram('Benchmark', [(f'service{i % 100}', f'service{(i + 1) % 100}', f'request {i}') for i in range(STEPS)])
+    for name, fn in (('whole text + deflate', whole_text), ('streamed deflate', streamed), ('write_to file', write_to)):
+        elapsed, peak = measure(fn, diagram)
+        print(f"{name:<22} {elapsed * 1000:8.1f} ms  peak {peak / 1024:9.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Micro-benchmark of the PlantUML text encoder.
+
+Compares the table-driven encoder against the historical per-character
+implementation on deflated payloads of typical diagram sizes.
+
+Usage:
+    python -m plantumlapi.benchmarks.bench_encoding
+"""
+
+import os
+import timeit
+
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi.encoding import encode
+
+
+def legacy_encode(plantuml, data):
+    res = ""
+    for i in range(0, len(data), 3):
+        if i + 2 == len(data):
+            res += plantuml._encode3bytes(data[i], data[i + 1], 0)
+        elif i + 1 == len(data):
+            res += plantuml._encode3bytes(data[i], 0, 0)
+        else:
+            res += plantuml._encode3bytes(data[i], data[i + 1], data[i + 2])
+    return res
+
+
+def main():
+    plantuml = PlantUML(url="http://localhost:8080/img/")
+    for size in (1024, 50 * 1024, 200 * 1024):
+        data = os.urandom(size)
+        number = 5
+        legacy = min(timeit.repeat(lambda: legacy_encode(plantuml, data), number=number, repeat=3)) / number
+        table = min(timeit.repeat(lambda: encode(data), number=number, repeat=3)) / number
+        print(f"{size // 1024:>4} KiB  legacy {legacy * 1000:9.3f} ms  table {table * 1000:7.3f} ms  x{legacy / table:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Memory benchmark of the diagram models.
+
+Builds a 1M edge network over 10k nodes, as lists of ``(source, target)``
+tuples like the models used to store them, and as a
+:class:`NetworkDiagram` backed by arrays of node ids, and compares the
+memory each holds. The names are built per edge, as when read from a data
+source, and also shared, as the most favourable case for the tuples.
+
+Usage:
+    python -m plantumlapi.benchmarks.bench_models
+"""
+
+import tracemalloc
+
+from plantumlapi.plantumlapi.diagrams import NetworkDiagram
+
+NODES = 10_000
+EDGES = 1_000_000
+
+
+def edges():
+    for i in range(EDGES):
+        yield f'host{i % NODES}', f'host{(i * 7 + 1) % NODES}'
+
+
+def measure(build):
+    tracemalloc.start()
+    model = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del model
+    return size
+
+
+def main():
+    names = [f'host{i}' for i in range(NODES)]
+    results = {
+        'tuples, names per edge': measure(lambda: list(edges())),
+        'tuples, shared names': measure(lambda: [(names[i % NODES], names[(i * 7 + 1) % NODES]) for i in range(EDGES)]),
+        'NetworkDiagram': measure(lambda: NetworkDiagram('network', [], edges())),
+    }
+    compact = results['NetworkDiagram']
+    for name, size in results.items():
+        print(f"{name:<24} {size / 2 ** 20:8.1f} MiB  x{size / compact:5.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark suite of the encoding, URL building and render paths.
+
+Times ``deflate_and_encode``, ``encode``, ``get_url``, ``process`` and
+``process_file`` on sequence diagrams of 100 B to 1 MB and reports, for
+each, the operations per second, the p50 and p99 latency and the peak
+memory of one operation. The renders go to a stub server started on
+localhost, which answers every request with the same small image, so the
+numbers measure the client and not a PlantUML server or the network.
+
+Each benchmark is run ``--rounds`` times and the best value of each metric
+kept, which filters out most of the noise of a shared machine. Results can
+be saved as a baseline, and later runs compared against it:
+a run fails when a metric is worse than the baseline by more than the
+threshold, ops/sec lower or p50 latency or peak memory higher. The p99
+latency is too noisy to gate on and is only reported. The default
+threshold of 50% suits a shared machine; use a tighter one on a quiet
+dedicated one, with a baseline saved there.
+
+Usage:
+    python -m plantumlapi.benchmarks.bench_suite [--quick] [--only NAME] [--rounds 3]
+    python -m plantumlapi.benchmarks.bench_suite --save [--baseline FILE]
+    python -m plantumlapi.benchmarks.bench_suite --check [--baseline FILE] [--threshold 0.5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from threading import Thread
+
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi.encoding import deflate, encode
+
+SIZES = (100, 1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+IMAGE = b'\x89PNG\r\n\x1a\n' + bytes(256)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer every GET and POST with the same image, over keep-alive."""
+    protocol_version = 'HTTP/1.1'
+    # the headers and the image are written separately
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            while size := int(self.rfile.readline().strip() or b'0', 16):
+                self.rfile.read(size + 2)
+            self.rfile.readline()
+        else:
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._reply()
+
+    def _reply(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(IMAGE)))
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    return server
+
+
+def diagram(size):
+    """Return a sequence diagram of about ``size`` bytes."""
+    lines, length, i = ['@startuml'], len('@startuml\n@enduml\n'), 0
+    while length < size:
+        line = f'service{i % 50} -> service{(i * 7 + 1) % 50} : request {i}'
+        lines.append(line)
+        length += len(line) + 1
+        i += 1
+    lines.append('@enduml')
+    return '\n'.join(lines) + '\n'
+
+
+def label(size):
+    return f'{size // 1024} KiB' if size >= 1024 else f'{size} B'
+
+
+def cases(plantuml, directory):
+    """Yield ``(name, size, operation)`` for every benchmark."""
+    for size in SIZES:
+        text = diagram(size)
+        deflated = deflate(text)
+        source = os.path.join(directory, f'bench-{size}.puml')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write(text)
+        outfile = os.path.join(directory, f'bench-{size}.png')
+        yield 'deflate_and_encode', size, lambda text=text: plantuml.deflate_and_encode(text)
+        yield 'encode', size, lambda deflated=deflated: encode(deflated)
+        yield 'get_url', size, lambda text=text: plantuml.get_url(text)
+        yield 'process', size, lambda text=text: plantuml.process(text)
+        yield 'process_file', size, lambda source=source, outfile=outfile: plantuml.process_file(source, outfile)
+
+
+def measure(operation, budget, min_runs=5, max_runs=10_000):
+    """Run an operation for about ``budget`` seconds and return its metrics.
+
+    Operations shorter than a millisecond are timed in batches lasting
+    about one, each latency sample being the mean of a batch.
+    """
+    begin = time.perf_counter()
+    operation()
+    batch = max(1, int(0.001 / max(time.perf_counter() - begin, 1e-7)))
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_runs or (len(latencies) < max_runs and time.perf_counter() - started < budget):
+        begin = time.perf_counter()
+        for _ in range(batch):
+            operation()
+        latencies.append((time.perf_counter() - begin) / batch)
+    latencies.sort()
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'ops_per_sec': len(latencies) / sum(latencies),
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'peak_kib': peak / 1024,
+    }
+
+
+def best_of(runs):
+    """Return the best value of each metric over several runs."""
+    return {metric: (max if metric == 'ops_per_sec' else min)(run[metric] for run in runs) for metric in runs[0]}
+
+
+def compare(results, baseline, threshold):
+    """Return the metrics worse than the baseline by more than ``threshold``."""
+    regressions = []
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if metrics['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append(f"{key}: {metrics['ops_per_sec']:,.1f} ops/s, baseline {base['ops_per_sec']:,.1f}")
+        for metric in ('p50_ms', 'peak_kib'):
+            if metrics[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{key}: {metric} {metrics[metric]:,.3f}, baseline {base[metric]:,.3f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PlantUML client benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='run each benchmark for 0.1 s instead of 1 s')
+    parser.add_argument('--rounds', type=int, default=3, help='runs of each benchmark, the best is kept')
+    parser.add_argument('--only', help='run the benchmarks whose name contains this')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline results file')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--check', action='store_true', help='fail if a metric regressed against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed regression, 0.5 for 50%%')
+    args = parser.parse_args(argv)
+
+    server = start_stub()
+    results = {}
+    try:
+        with PlantUML(f'http://127.0.0.1:{server.server_address[1]}/png') as plantuml, TemporaryDirectory() as directory:
+            print(f"{'benchmark':<28} {'ops/sec':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}")
+            for name, size, operation in cases(plantuml, directory):
+                if args.only and args.only not in name:
+                    continue
+                key = f'{name}/{label(size)}'
+                results[key] = metrics = best_of([measure(operation, 0.1 if args.quick else 1.0) for _ in range(args.rounds)])
+                print(f"{key:<28} {metrics['ops_per_sec']:>12,.1f} {metrics['p50_ms']:>10.3f} {metrics['p99_ms']:>10.3f} {metrics['peak_kib']:>10,.1f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+    if args.check:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regression beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,13 +6,26 @@ This library allows you to connect to a PlantUML server and render
 PlantUML markup into PNG images.
 """
 
-from os import makedirs, path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from hashlib import sha256
+from itertools import count, islice, repeat, tee
+from os import fdopen, makedirs, path, remove, replace
+from shutil import copyfileobj
+from tempfile import mkstemp
+from threading import Barrier, BrokenBarrierError
+from time import sleep
 from io import open
 from typing import Optional
-from zlib import compress
+from zlib import DEFLATED, MAX_WBITS, compressobj
 import httpx
 
-from plantumlapi.plantumlapi.errors import PlantUMLConnectionError, PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.async_client import AsyncPlantUML
+from plantumlapi.plantumlapi.encoding import FORMATS, decode, decode_and_inflate, deflate_and_encode, encode, encode_many, iter_chunks, parse_url, split_endpoint
+from plantumlapi.plantumlapi.errors import PlantUMLCircuitOpenError, PlantUMLConnectionError, PlantUMLError, PlantUMLHTTPError, PlantUMLTimeoutError
+from plantumlapi.plantumlapi.limiter import AIMDLimiter
+from plantumlapi.plantumlapi.resilience import CircuitBreaker, Deadline, RetryPolicy, is_server_error
+from plantumlapi.plantumlapi.singleflight import SingleFlight
+from plantumlapi.plantumlapi.split import LIMIT_SIZE, paginate, split_diagrams
 
 # Example usage
 diagram = """
@@ -51,9 +64,43 @@ class PlantUML:
                     httplib2.Http() constructor.
     :param dict request_opts: Extra options to be passed off to the
                     httplib2.Http().request() call.
+    :param cache: Optional render cache, such as a
+                    :class:`plantumlapi.plantumlapi.cache.RenderCache`, checked
+                    before contacting the server.
+    :param int post_threshold: Size in bytes of the plantuml text above which
+                    it is sent in a POST body instead of encoded in the URL,
+                    to stay under proxy and server URL length limits. ``None``
+                    always uses GET.
+    :param RetryPolicy retry: Optional policy to retry renders that failed
+                    because of the server or the connection.
+    :param CircuitBreaker circuit_breaker: Optional breaker that fails
+                    renders fast while the server's error rate is too high.
+    :param int max_connections: Maximum number of connections to the server.
+    :param int max_keepalive_connections: Maximum number of idle connections
+                    kept open for reuse.
+    :param float keepalive_expiry: Seconds an idle connection is kept open.
+    :param bool http2: Use HTTP/2 when the server supports it, requires the
+                    ``h2`` package (``pip install httpx[http2]``).
+    :param timeout: Request timeout in seconds, or an ``httpx.Timeout``.
+    :param httpx.Client client: Existing client to use instead of creating
+                    one, so several PlantUML instances pointed at the same
+                    host share its connection pool. ``http_opts`` and the
+                    connection options above are then ignored, and the
+                    client is not closed by :meth:`close`.
+    :param bool coalesce: Share one request between concurrent identical
+                    calls to :meth:`process` (same diagram and format)
+                    instead of sending one each.
+    :param AIMDLimiter limiter: Optional adaptive limit on the number of
+                    requests in flight to the server. Give batches at least
+                    ``limiter.max_limit`` workers so the limit, not the
+                    thread count, sets the concurrency.
 
     """
-    def __init__(self, url: str, basic_auth: dict = None, form_auth: dict = None, http_opts: dict = None, request_opts: dict = None) -> None:
+    _post_headers = {'Content-Type': 'text/plain; charset=utf-8'}
+
+    def __init__(self, url: str, basic_auth: dict = None, form_auth: dict = None, http_opts: dict = None, request_opts: dict = None, cache=None, post_threshold: Optional[int] = 16 * 1024, retry: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None, keepalive_expiry: Optional[float] = None, http2: bool = False, timeout=None, client: Optional[httpx.Client] = None,
+                 coalesce: bool = False, limiter: Optional[AIMDLimiter] = None) -> None:
 
         if basic_auth is None:
             basic_auth = {}
@@ -65,13 +112,32 @@ class PlantUML:
             request_opts = {}
 
         self.url = url
+        self.server, self.format = split_endpoint(url)
         self.request_opts = request_opts
+        self.cache = cache
+        self.post_threshold = post_threshold
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self._single_flight = SingleFlight() if coalesce else None
+        self.limiter = limiter
 
         if auth_type := 'basic_auth' if basic_auth else ('form_auth' if form_auth else None):
             self.auth_type = auth_type
 
         self.auth = basic_auth or form_auth or None
-        self.client = httpx.Client(**http_opts, proxies=http_opts.get('proxies'))
+        self._owns_client = client is None
+        if client is None:
+            http_opts = dict(http_opts)
+            limits = {'max_connections': max_connections, 'max_keepalive_connections': max_keepalive_connections, 'keepalive_expiry': keepalive_expiry}
+            if any(value is not None for value in limits.values()):
+                default = httpx.Limits()
+                http_opts['limits'] = httpx.Limits(**{name: getattr(default, name) if value is None else value for name, value in limits.items()})
+            if http2:
+                http_opts['http2'] = True
+            if timeout is not None:
+                http_opts['timeout'] = timeout
+            client = httpx.Client(**http_opts)
+        self.client = client
 
         if auth_type == 'basic_auth':
             self.client.auth = (username := self.auth['username'], self.auth['password'])
@@ -89,65 +155,548 @@ class PlantUML:
                 raise PlantUMLHTTPError(response, "Login failed. Check your form_auth settings.")
             self.request_opts['Cookie'] = response.cookies.get_dict()
 
-    def get_url(self, plantuml_text):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the connection pool, unless the client was passed in."""
+        if self._owns_client:
+            self.client.close()
+
+    def warmup(self, connections: int = 4, timeout: float = 5.0):
+        """Open connections to the server before the first burst of renders,
+        so connection setup and TLS handshakes are off the critical path.
+
+        The connections are opened concurrently and held until all of them
+        are established, then returned to the pool. At most
+        ``max_keepalive_connections`` of them stay open.
+
+        :param int connections: Number of connections to open
+        :param float timeout: Seconds to wait for all connections
+        :returns: the number of connections that were opened
+        """
+        barrier = Barrier(connections, timeout=timeout)
+
+        def open_connection(_):
+            try:
+                with self.client.stream('GET', f'{self.server}/', timeout=timeout) as response:
+                    try:
+                        barrier.wait()
+                    except BrokenBarrierError:
+                        pass
+                    # a connection closed with its body unread is not pooled
+                    response.read()
+            except httpx.HTTPError:
+                barrier.abort()
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            return sum(executor.map(open_connection, range(connections)))
+
+    def endpoint(self, format: Optional[str] = None):
+        """Return the server endpoint for an output format.
+
+        :param str format: One of ``FORMATS`` (png, svg, txt, pdf, eps, ...).
+                    Defaults to the endpoint of ``url``.
+        :returns: the endpoint URL
+        """
+        if format is None:
+            return self.url.rstrip('/')
+        if format not in FORMATS:
+            raise PlantUMLError(f"Unknown output format '{format}', expected one of {', '.join(FORMATS)}")
+        return f'{self.server}/{format}'
+
+    def get_url(self, plantuml_text, format: Optional[str] = None):
         """Return the server URL for the image.
         You can use this URL in an IMG HTML tag.
 
         :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format, defaults to the one of ``url``
         :returns: the plantuml server image URL
         """
-        return f'{self.url}/{self.deflate_and_encode(plantuml_text)}'
+        return f'{self.endpoint(format)}/{self.deflate_and_encode(plantuml_text)}'
+
+    def get_urls(self, plantuml_texts, format: Optional[str] = None, processes: Optional[int] = None, chunksize: int = 256):
+        """Return the server URLs of many diagrams, encoding them over a
+        pool of processes. See :func:`encoding.encode_many`.
+
+        :param plantuml_texts: Iterable of plantuml markup
+        :param str format: Output format, defaults to the one of ``url``
+        :param int processes: Number of worker processes, defaults to the
+                    number of CPUs
+        :param int chunksize: Number of texts sent to a worker at once
+        :returns: generator of the image URLs, in input order
+        """
+        endpoint = self.endpoint(format)
+        for encoded in encode_many(plantuml_texts, processes=processes, chunksize=chunksize):
+            yield f'{endpoint}/{encoded}'
+
+    def process(self, plantuml_text: str, format: Optional[str] = None, deadline=None, encoded: Optional[str] = None):
+        """Processes the plantuml text into the raw image data.
+
+        Diagrams larger than ``post_threshold`` are sent as the body of a
+        POST request, the returned URL is then the server endpoint.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format, defaults to the one of ``url``
+        :param deadline: Optional time budget for the render, retries
+                    included, in seconds or as a shared :class:`Deadline`.
+        :param str encoded: The text already deflated and encoded, to skip
+                    that step. The render then always uses GET and
+                    ``plantuml_text`` may be ``None``.
+        :returns: the raw image data and the image URL
+        :raises: PlantUMLTimeoutError if the deadline is exceeded
+        """
+        return self._send(*self._request(plantuml_text, format, encoded), deadline=Deadline.of(deadline))
+
+
+    def process_formats(self, plantuml_text: str, formats, max_workers: Optional[int] = None):
+        """Processes the plantuml text into several output formats at once.
+        The text is encoded a single time and the formats are fetched
+        concurrently.
 
-    def process(self, plantuml_text: str):
-        """Processes the plantuml text into the raw PNG image data.
         :param str plantuml_text: The plantuml markup to render
-        :returns: the raw image data
+        :param formats: Iterable of output formats, e.g. ``('svg', 'png')``
+        :param int max_workers: Number of formats fetched at once, all of
+                    them by default.
+        :returns: dict mapping each format to ``(content, url)``
+        """
+        formats = list(dict.fromkeys(formats))
+        encoded = None if self._use_post(plantuml_text) else self.deflate_and_encode(plantuml_text)
+        requests = [self._request(plantuml_text, output_format, encoded) for output_format in formats]
+        with ThreadPoolExecutor(max_workers=max_workers or len(formats) or 1) as executor:
+            results = executor.map(lambda request: self._send(*request), requests)
+            return dict(zip(formats, results))
+
+
+    def cache_key(self, encoded: str, format: Optional[str] = None):
+        """Return the render cache key of an encoded diagram.
+
+        :param str encoded: The encoded plantuml markup
+        :param str format: Output format, defaults to the one of ``url``
+        :returns: ``(server URL, output format, encoded)``
+        """
+        return self.server, format or self.format, encoded
+
+
+    def _use_post(self, plantuml_text: str):
+        return self.post_threshold is not None and len(plantuml_text.encode('utf-8')) > self.post_threshold
+
+
+    def _request(self, plantuml_text: str, format: Optional[str] = None, encoded: Optional[str] = None):
+        """Return the method, URL, body and cache key used to render the
+        plantuml text. Small diagrams are deflated and encoded into a GET
+        URL, large ones are sent as is in a POST body.
+        """
+        if encoded is None and self._use_post(plantuml_text):
+            source = plantuml_text.encode('utf-8')
+            return 'POST', self.endpoint(format), source, self.cache_key(f'sha256:{sha256(source).hexdigest()}', format)
+        if encoded is None:
+            encoded = self.deflate_and_encode(plantuml_text)
+        return 'GET', f'{self.endpoint(format)}/{encoded}', None, self.cache_key(encoded, format)
+
+
+    def _send(self, method: str, url: str, body, key, deadline: Optional[Deadline] = None):
+        """Send a render request prepared by :meth:`_request`, going through
+        the render cache. ``body`` is bytes, or a callable returning an
+        iterator of bytes, called again on each attempt, to stream it.
+        """
+        if self.cache is not None:
+            if (content := self.cache.get(key)) is not None:
+                return content, url
+
+        def send(timeout):
+            try:
+                response = self.client.request(method, url, content=body() if callable(body) else body, headers=self._post_headers if body else None, timeout=timeout)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise PlantUMLHTTPError(e, "") from e
+            return response
+
+        def fetch():
+            content = self._attempt(send, deadline).content
+            if self.cache is not None:
+                self.cache.set(key, content)
+            return content
+
+        if self._single_flight is not None:
+            return self._single_flight.do(key, fetch), url
+        return fetch(), url
+
+
+    def process_lines(self, draw, format: Optional[str] = None, deadline=None, size: Optional[int] = None, digest: Optional[str] = None):
+        """Processes plantuml markup generated line by line, such as a
+        diagram model's ``draw``, without building the whole text.
+
+        The lines are deflated as they are generated. If the markup turns
+        out larger than ``post_threshold`` they are generated again and
+        streamed as the POST body.
+
+        :param draw: Callable returning an iterable of lines, without their
+                    line endings. It is called again for a POST.
+        :param str format: Output format, defaults to the one of ``url``
+        :param deadline: Optional time budget for the render
+        :param int size: Size in bytes of the markup, if already known
+        :param str digest: sha256 hex digest of the markup, if already
+                    known. With ``size`` above ``post_threshold`` the
+                    markup is then only generated to be sent.
+        :returns: the raw image data and the image URL
+        """
+        if size is None or digest is None or self.post_threshold is None or size <= self.post_threshold:
+            deflater = compressobj(-1, DEFLATED, -MAX_WBITS)
+            hasher, size, deflated = sha256(), 0, []
+            for chunk in iter_chunks(draw()):
+                data = chunk.encode('utf-8')
+                hasher.update(data)
+                size += len(data)
+                if self.post_threshold is None or size <= self.post_threshold:
+                    deflated.append(deflater.compress(data))
+            if self.post_threshold is None or size <= self.post_threshold:
+                deflated.append(deflater.flush())
+                encoded = encode(b''.join(deflated))
+                return self._send('GET', f'{self.endpoint(format)}/{encoded}', None, self.cache_key(encoded, format), deadline=Deadline.of(deadline))
+            digest = hasher.hexdigest()
+
+        def body():
+            return (chunk.encode('utf-8') for chunk in iter_chunks(draw()))
+
+        return self._send('POST', self.endpoint(format), body, self.cache_key(f'sha256:{digest}', format), deadline=Deadline.of(deadline))
+
+
+    def process_many(self, plantuml_texts, max_workers: int = 8, ordered: bool = True, return_exceptions: bool = True, format: Optional[str] = None, deadline=None, encode_processes: int = 0):
+        """Processes many plantuml texts concurrently over the shared
+        connection pool.
+
+        :param plantuml_texts: Iterable of plantuml markup to render
+        :param int max_workers: Number of renders in flight at once
+        :param bool ordered: Return results in input order if ``True``,
+                    in completion order otherwise.
+        :param bool return_exceptions: If ``True`` a failed render puts its
+                    exception in place of the image data. Otherwise the
+                    first failure, in completion order, is raised as soon
+                    as it is seen: the renders in flight are finished and
+                    discarded, and the texts not submitted yet are never
+                    rendered.
+        :param str format: Output format, defaults to the one of ``url``
+        :param deadline: Optional time budget for the whole batch, in
+                    seconds. Renders still pending when it is exceeded
+                    fail with PlantUMLTimeoutError.
+        :param int encode_processes: See :meth:`iter_completed`.
+        :returns: list of ``(content, url)`` tuples
+        """
+        results = []
+        for index, content, url in self.iter_completed(plantuml_texts, max_workers=max_workers, format=format, deadline=deadline, encode_processes=encode_processes):
+            if not return_exceptions and isinstance(content, Exception):
+                raise content
+            results.append((index, content, url))
+        if ordered:
+            results.sort(key=lambda result: result[0])
+        return [(content, url) for _, content, url in results]
+
+
+    def iter_completed(self, plantuml_texts, max_workers: int = 8, format: Optional[str] = None, deadline=None, encode_processes: int = 0, chunksize: int = 256):
+        """Processes many plantuml texts concurrently and yields each result
+        as soon as it is available.
+
+        At most ``2 * max_workers`` texts are pulled from ``plantuml_texts``
+        ahead of the results, so it can be a lazy iterator over a very
+        large batch. A failed render does not stop the batch: its
+        ``content`` is the raised exception instead of the image data.
+
+        :param plantuml_texts: Iterable of plantuml markup to render
+        :param int max_workers: Number of renders in flight at once
+        :param str format: Output format, defaults to the one of ``url``
+        :param deadline: Optional time budget for the whole batch, in
+                    seconds or as a :class:`Deadline`.
+        :param int encode_processes: If set, deflate and encode the texts
+                    in that many worker processes, ``chunksize`` texts at
+                    a time, ahead of the HTTP requests, instead of in the
+                    request threads where they compete for the GIL.
+        :param int chunksize: Number of texts sent to an encoding process at once
+        :returns: generator of ``(index, content, url)`` tuples
+        """
+        deadline = Deadline.of(deadline)
+        if encode_processes:
+            plantuml_texts, to_encode = tee(plantuml_texts)
+            encoded = encode_many(to_encode, processes=encode_processes, chunksize=chunksize, max_size=self.post_threshold)
+        else:
+            encoded = repeat(None)
+        items = enumerate(zip(plantuml_texts, encoded))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self._process_or_error, text, format, deadline, text_encoded): index for index, (text, text_encoded) in islice(items, 2 * max_workers)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    yield (index, *future.result())
+                    for index, (text, text_encoded) in islice(items, 1):
+                        pending[executor.submit(self._process_or_error, text, format, deadline, text_encoded)] = index
+
+
+    def _process_or_error(self, plantuml_text: str, format: Optional[str] = None, deadline: Optional[Deadline] = None, encoded: Optional[str] = None):
+        """Like :meth:`process` but returns the exception in place of the
+        image data instead of raising it.
         """
-        url = self.get_url(plantuml_text)
         try:
-            response = self.client.get(url)
-            response.raise_for_status()
-        except httpx.HTTPError as e:
-            raise PlantUMLHTTPError(e, "") from e
-        return response.content, url
+            return self.process(plantuml_text, format, deadline, encoded)
+        except (PlantUMLError, PlantUMLHTTPError) as e:
+            try:
+                url = self.get_url(plantuml_text, format)
+            except Exception:
+                url = None
+            return e, url
 
 
-    def process_file(self, filename, outfile=None, errorfile=None, directory=''):
+    def process_file(self, filename, outfile=None, errorfile=None, directory='', format: Optional[str] = None):
         """Take a filename of a file containing plantuml text and processes
-        it into a .png image.
+        it into an image, a .png one by default.
 
         :param str filename: Text file containing plantuml markup
         :param str outfile: Filename to write the output image to. If not
                     supplied, then it will be the input filename with the
-                    file extension replaced with '.png'.
+                    file extension replaced with the one of ``format``.
         :param str errorfile: Filename to write server html error page
                     to. If this is not supplined, then it will be the
                     input ``filename`` with the extension replaced with
                     '_error.html'.
+        :param str format: Output format, defaults to the one of ``url``
         :returns: ``True`` if the image write succedded, ``False`` if there was
                     an error written to ``errorfile``.
         """
-        data = open(filename).read()
+        if outfile is None:
+            outfile = path.splitext(filename)[0] + FORMATS.get(format or self.format, '.png')
+        if errorfile is None:
+            errorfile = f'{path.splitext(filename)[0]}_error.html'
+        with open(filename) as source:
+            data = source.read()
         try:
-            content = self.processes(data)
+            self.download(data, path.join(directory, outfile), format)
         except PlantUMLHTTPError as e:
             with open(path.join(directory, errorfile), 'w') as err:
                 err.write(e.content)
             return False
-        with open(path.join(directory, outfile), 'wb') as out:
-            out.write(content)
         return True
 
 
+    def process_pages(self, plantuml_text: str, format: Optional[str] = None, limit: int = LIMIT_SIZE, max_workers: int = 8, deadline=None):
+        """Render a diagram too large for the server in pages, concurrently.
+
+        Sequence diagrams estimated taller than ``limit`` are broken with
+        ``newpage`` lines, see :func:`plantumlapi.plantumlapi.split.paginate`,
+        and every page, inserted or already there, is rendered as a diagram
+        of its own instead of coming back cropped.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format, defaults to the one of ``url``
+        :param int limit: Size budget of a page in pixels, the
+                    ``PUML_LIMIT_SIZE`` of the server
+        :param int max_workers: Number of pages rendered at once
+        :param deadline: Optional time budget for all the pages
+        :returns: list of ``(content, url)`` tuples of the pages, in order
+        :raises: the error of the first page that failed
+        """
+        texts = [diagram.text for diagram in split_diagrams(paginate(plantuml_text.splitlines(), limit), pages=True)]
+        return self.process_many(texts, max_workers=max_workers, return_exceptions=False, format=format, deadline=deadline)
+
+
+    def process_blocks(self, filename, directory='', format: Optional[str] = None, max_workers: int = 8, pages: bool = False, limit: Optional[int] = None):
+        """Render each diagram of a file holding several ``@startuml ...
+        @enduml`` blocks into its own image, concurrently.
+
+        The file is read lazily, only the diagrams being rendered are held
+        in memory. The images are named after the file, then the diagram
+        name or index, then the page: ``seq-login.png``, ``seq-1.png``,
+        ``seq-1-2.png``. A file holding a single diagram gives ``seq.png``.
+
+        :param str filename: Text file containing plantuml markup
+        :param str directory: Directory the images are written to
+        :param str format: Output format, defaults to the one of ``url``
+        :param int max_workers: Number of renders in flight
+        :param bool pages: Also split the blocks at ``newpage`` lines, see
+                    :func:`plantumlapi.plantumlapi.split.split_diagrams`
+        :param int limit: Size budget of a page in pixels. When given, long
+                    sequence diagrams are first broken into pages that fit,
+                    see :func:`plantumlapi.plantumlapi.split.paginate`, and
+                    the pages are split.
+        :returns: generator of ``(diagram, outfile, error)`` tuples in
+                  completion order, ``error`` being ``None`` on success
+        """
+        extension = FORMATS.get(format or self.format, '.png')
+        stem = path.join(directory, path.splitext(path.basename(filename))[0])
+        in_flight, indices = {}, count()
+
+        def texts():
+            with open(filename, encoding='utf-8') as source:
+                diagrams = split_diagrams(source if limit is None else paginate(source, limit), pages or limit is not None)
+                diagram, upcoming = next(diagrams, None), next(diagrams, None)
+                single = upcoming is None
+                while diagram is not None:
+                    suffix = '' if single else f'-{diagram.name or diagram.index}' + (f'-{diagram.page}' if diagram.page else '')
+                    in_flight[next(indices)] = (diagram, f'{stem}{suffix}{extension}')
+                    yield diagram.text
+                    diagram, upcoming = upcoming, next(diagrams, None)
+
+        for index, content, _ in self.iter_completed(texts(), max_workers=max_workers, format=format):
+            diagram, outfile = in_flight.pop(index)
+            if isinstance(content, Exception):
+                yield diagram, outfile, content
+                continue
+            with open(outfile, 'wb') as out:
+                out.write(content)
+            yield diagram, outfile, None
+
+
+    def render_to(self, plantuml_text: str, fileobj, format: Optional[str] = None, chunk_size: int = 64 * 1024):
+        """Render the plantuml text and stream the image into a file object,
+        so memory use does not grow with the size of the image.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param fileobj: Writable binary file object, buffer or socket file
+        :param str format: Output format, defaults to the one of ``url``
+        :param int chunk_size: Size of the chunks written to ``fileobj``
+        :returns: the image URL
+        """
+        method, url, body, key = self._request(plantuml_text, format)
+        self._stream(method, url, body, key, fileobj, chunk_size)
+        return url
+
+
+    def download(self, plantuml_text: str, outfile: str, format: Optional[str] = None, chunk_size: int = 64 * 1024):
+        """Render the plantuml text and stream the image to ``outfile``.
+
+        The image is written to a temporary file next to ``outfile`` and
+        renamed into place once complete, so ``outfile`` never holds a
+        partial image.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str outfile: Filename to write the output image to.
+        :param str format: Output format, defaults to the one of ``url``
+        :param int chunk_size: Size of the chunks written to ``outfile``
+        :returns: the image URL
+        """
+        method, url, body, key = self._request(plantuml_text, format)
+        fd, tmp = mkstemp(dir=path.dirname(path.abspath(outfile)), prefix='.tmp-')
+        try:
+            with fdopen(fd, 'wb') as out:
+                fetched = self._stream(method, url, body, key, out, chunk_size)
+            replace(tmp, outfile)
+        except BaseException:
+            remove(tmp)
+            raise
+        if fetched and self.cache is not None:
+            self.cache.set_file(key, outfile)
+        return url
+
+
+    def _stream(self, method: str, url: str, body: Optional[bytes], key, fileobj, chunk_size: int):
+        """Write the image of a render request prepared by :meth:`_request`
+        into ``fileobj``, from the render cache when possible.
+
+        :returns: ``True`` if the image was fetched from the server,
+                    ``False`` if it came from the cache
+        """
+        if self.cache is not None:
+            if hasattr(self.cache, 'get_path'):
+                if (cached := self.cache.get_path(key)) is not None:
+                    with open(cached, 'rb') as image:
+                        copyfileobj(image, fileobj, chunk_size)
+                    return False
+            elif (content := self.cache.get(key)) is not None:
+                fileobj.write(content)
+                return False
+        started = False
+
+        def send(timeout):
+            nonlocal started
+            try:
+                with self.client.stream(method, url, content=body, headers=self._post_headers if body else None, timeout=timeout) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(chunk_size):
+                        started = True
+                        fileobj.write(chunk)
+            except httpx.HTTPError as e:
+                raise PlantUMLHTTPError(e, "") from e
+
+        # a render can not be retried once part of it reached fileobj
+        self._attempt(send, can_retry=lambda: not started)
+        return True
+
+
+    def _attempt(self, send, deadline: Optional[Deadline] = None, can_retry=None):
+        """Call ``send(timeout)`` under the retry policy, the circuit breaker,
+        the concurrency limiter and the deadline, and return its result.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = deadline.check() if deadline is not None else httpx.USE_CLIENT_DEFAULT
+            try:
+                result = self._call(send, timeout, deadline)
+            except PlantUMLHTTPError as e:
+                if deadline is not None and deadline.expired() and isinstance(e.response, httpx.TimeoutException):
+                    raise PlantUMLTimeoutError(f"Deadline of {deadline.seconds}s exceeded") from e
+                if self.retry is None or attempt >= self.retry.max_attempts or not self.retry.is_retryable(e):
+                    raise
+                if can_retry is not None and not can_retry():
+                    raise
+                delay = self.retry.delay(attempt)
+                if deadline is not None and deadline.remaining() <= delay:
+                    raise
+                sleep(delay)
+                continue
+            return result
+
+
+    def _call(self, send, timeout, deadline: Optional[Deadline] = None):
+        """Make a single attempt of ``send(timeout)`` within a limiter slot,
+        if the circuit breaker lets it through, and record its outcome.
+
+        Errors other than HTTP ones, such as a failed write of the image,
+        say nothing about the server: the breaker's reservation is only
+        released, so a half open circuit is never left waiting for a trial
+        call that is over. Only successes and server errors give the
+        limiter a latency sample; calls failed fast by the breaker and
+        diagram errors just free their slot.
+        """
+        token = None
+        if self.limiter is not None:
+            token = self.limiter.acquire(None if deadline is None else deadline.remaining())
+        success, measured = True, False
+        try:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+            try:
+                result = send(timeout)
+            except PlantUMLHTTPError as e:
+                success = not is_server_error(e)
+                measured = not success
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(success)
+                raise
+            except BaseException:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.release()
+                raise
+            measured = True
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(True)
+            return result
+        finally:
+            if token is not None:
+                self.limiter.release(token, success, measured)
+
+
     def deflate_and_encode(self, plantuml_text):
         """zlib compress the plantuml text and encode it for the plantuml server.
 
         :param str plantuml_text: The plantuml markup to render
         :returns: The encoded plantuml markup
         """
-        zlibbed_str = compress(plantuml_text.encode('utf-8'))
-        compressed_string = zlibbed_str[2:-4]
-        return self.encode(compressed_string)
+        return deflate_and_encode(plantuml_text)
 
 
     def encode(self, data: bytes):
@@ -157,15 +706,28 @@ class PlantUML:
         :param bytes data: The data to encode
         :returns: The encoded data
         """
-        res = ""
-        for i in range(0, len(data), 3):
-            if i + 2 == len(data):
-                res += self._encode3bytes(data[i], data[i + 1], 0)
-            elif i + 1 == len(data):
-                res += self._encode3bytes(data[i], 0, 0)
-            else:
-                res += self._encode3bytes(data[i], data[i + 1], data[i + 2])
-        return res
+        return encode(data)
+
+
+    def decode(self, encoded: str):
+        """decode data in the plantuml server encoding back into bytes
+
+        :param str encoded: The encoded data
+        :returns: The decoded data
+        """
+        return decode(encoded)
+
+
+    def decode_and_inflate(self, encoded: str):
+        """Turn an encoded plantuml path segment, or a full plantuml server
+        image URL, back into the plantuml text.
+
+        :param str encoded: The encoded plantuml markup or image URL
+        :returns: The plantuml markup
+        """
+        if '/' in encoded:
+            encoded = parse_url(encoded).encoded
+        return decode_and_inflate(encoded)
 
 
     def _encode3bytes(self, b1: int, b2: int, b3: int):
@@ -210,17 +772,18 @@ class PlantUML:
         return '_' if b == 1 else '?'
 
     def generate_image_from_string(
-            self, plantuml_text: str, outfile: str) -> list[bytes, str, str]:
+            self, plantuml_text: str, outfile: str, format: Optional[str] = None) -> list[bytes, str, str]:
         """Generate an image from a string containing plantuml markup.
 
         :param str plantuml_text: The plantuml markup to render
         :param str outfile: Filename to write the output image to.
+        :param str format: Output format, defaults to the one of ``url``
         :returns: ``True`` if the image write succedded, ``False`` if there was
         :raises: PlantUMLHTTPError if there was an error
         """
 
         try:
-            content, url = self.process(plantuml_text)
+            content, url = self.process(plantuml_text, format)
         except PlantUMLHTTPError as e:
             raise PlantUMLHTTPError(e, "") from e
         with open(outfile, 'wb') as out:
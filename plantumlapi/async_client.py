@@ -0,0 +1,170 @@
+"""
+Asynchronous PlantUML client.
+
+Same interface as :class:`plantumlapi.plantumlapi.PlantUML` but built on
+``httpx.AsyncClient`` so renders can run concurrently on one event loop and
+share one connection pool.
+"""
+
+import asyncio
+from io import open
+from typing import Optional
+
+import httpx
+
+from plantumlapi.plantumlapi.encoding import FORMATS, deflate_and_encode, split_endpoint
+from plantumlapi.plantumlapi.errors import PlantUMLConnectionError, PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.singleflight import AsyncSingleFlight
+
+
+class AsyncPlantUML:
+    """Asynchronous connection to a PlantUML server with optional authentication.
+
+    All parameters except ``url`` are optional and behave like the ones of
+    :class:`plantumlapi.plantumlapi.PlantUML`.
+
+    :param str url: URL to the PlantUML server image CGI.
+    :param dict basic_auth: Dictionary with 'username' and 'password' keys for
+                    basic HTTP authentication.
+    :param dict form_auth: Dictionary with 'url' and 'body' keys (and
+                    optionally 'method' and 'headers') for a cookie based
+                    webform login. The login happens on the first request.
+    :param dict http_opts: Extra options to be passed off to the
+                    httpx.AsyncClient() constructor.
+    :param dict request_opts: Extra options to be passed off to each
+                    httpx.AsyncClient().get() call.
+    :param int max_concurrency: Maximum number of requests in flight to the
+                    server at once. Extra calls wait for a free slot.
+    :param int post_threshold: Size in bytes of the plantuml text above which
+                    it is sent in a POST body instead of encoded in the URL.
+                    ``None`` always uses GET.
+    :param bool coalesce: Share one request between concurrent identical
+                    calls to :meth:`process` instead of sending one each.
+    """
+    _post_headers = {'Content-Type': 'text/plain; charset=utf-8'}
+
+    def __init__(self, url: str, basic_auth: dict = None, form_auth: dict = None, http_opts: dict = None, request_opts: dict = None, max_concurrency: int = 10, post_threshold: Optional[int] = 16 * 1024, coalesce: bool = False) -> None:
+
+        if basic_auth is None:
+            basic_auth = {}
+        if form_auth is None:
+            form_auth = {}
+        if http_opts is None:
+            http_opts = {}
+        if request_opts is None:
+            request_opts = {}
+
+        if form_auth:
+            if 'url' not in form_auth:
+                raise PlantUMLError("The form_auth option 'url' must be provided and point to the login url.")
+            if 'body' not in form_auth:
+                raise PlantUMLError("The form_auth option 'body' must be provided and include a dictionary with the form elements required to log in. Example: form_auth={'url': 'http://example.com/login/', 'body': { 'username': 'me', 'password': 'secret'}}")
+
+        self.url = url
+        self.server, self.format = split_endpoint(url)
+        self.request_opts = request_opts
+        self.auth_type = 'basic_auth' if basic_auth else ('form_auth' if form_auth else None)
+        self.auth = basic_auth or form_auth or None
+        self.max_concurrency = max_concurrency
+        self.post_threshold = post_threshold
+        self._single_flight = AsyncSingleFlight() if coalesce else None
+
+        http_opts = dict(http_opts)
+        http_opts.setdefault('limits', httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency))
+        self.client = httpx.AsyncClient(**http_opts)
+        if self.auth_type == 'basic_auth':
+            self.client.auth = (self.auth['username'], self.auth['password'])
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._login_lock = asyncio.Lock()
+        self._logged_in = self.auth_type != 'form_auth'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self.client.aclose()
+
+    async def login(self):
+        """Log in with the form_auth settings. Called automatically before
+        the first request, the session cookie is kept by the client.
+        """
+        async with self._login_lock:
+            if self._logged_in:
+                return
+            login_url, body, method, headers = self.auth['url'], self.auth['body'], self.auth.get('method', 'POST'), self.auth.get('headers', {'Content-type': 'application/x-www-form-urlencoded'})
+            try:
+                response = await self.client.request(method, login_url, headers=headers, data=body)
+            except httpx.HTTPError as e:
+                raise PlantUMLConnectionError(e) from e
+            if response.status_code != 200:
+                raise PlantUMLHTTPError(response, "Login failed. Check your form_auth settings.")
+            self._logged_in = True
+
+    def endpoint(self, format: Optional[str] = None):
+        """Return the server endpoint for an output format.
+
+        :param str format: One of ``FORMATS``, defaults to the endpoint of ``url``
+        :returns: the endpoint URL
+        """
+        if format is None:
+            return self.url.rstrip('/')
+        if format not in FORMATS:
+            raise PlantUMLError(f"Unknown output format '{format}', expected one of {', '.join(FORMATS)}")
+        return f'{self.server}/{format}'
+
+    def get_url(self, plantuml_text: str, format: Optional[str] = None):
+        """Return the server URL for the image.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format, defaults to the one of ``url``
+        :returns: the plantuml server image URL
+        """
+        return f'{self.endpoint(format)}/{deflate_and_encode(plantuml_text)}'
+
+    async def process(self, plantuml_text: str, format: Optional[str] = None):
+        """Processes the plantuml text into the raw image data. Diagrams
+        larger than ``post_threshold`` are sent in a POST body.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format, defaults to the one of ``url``
+        :returns: the raw image data and the image URL
+        """
+        if not self._logged_in:
+            await self.login()
+        source = plantuml_text.encode('utf-8')
+        if self.post_threshold is not None and len(source) > self.post_threshold:
+            method, url, body, headers = 'POST', self.endpoint(format), source, self._post_headers
+        else:
+            method, url, body, headers = 'GET', self.get_url(plantuml_text, format), None, None
+
+        async def fetch():
+            async with self._semaphore:
+                try:
+                    response = await self.client.request(method, url, content=body, headers=headers, **self.request_opts)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    raise PlantUMLHTTPError(e, "") from e
+            return response.content
+
+        if self._single_flight is not None:
+            return await self._single_flight.do((url, body), fetch), url
+        return await fetch(), url
+
+    async def generate_image_from_string(self, plantuml_text: str, outfile: str, format: Optional[str] = None):
+        """Generate an image from a string containing plantuml markup.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str outfile: Filename to write the output image to.
+        :param str format: Output format, defaults to the one of ``url``
+        :returns: the raw image data, the image URL and ``outfile``
+        :raises: PlantUMLHTTPError if there was an error
+        """
+        content, url = await self.process(plantuml_text, format)
+        with open(outfile, 'wb') as out:
+            out.write(content)
+        return content, url, outfile
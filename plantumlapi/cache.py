@@ -0,0 +1,278 @@
+"""
+Render caches for PlantUML.
+
+A cache maps a key of ``(server URL, output format, encoded text)`` to the
+rendered image data. Pass one as ``cache=`` to
+:class:`plantumlapi.plantumlapi.PlantUML` to skip the server for diagrams
+that were already rendered. :class:`RenderCache` lives in memory,
+:class:`DiskCache` in a directory shared by every process on the machine.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from shutil import copyfileobj
+from tempfile import mkstemp
+from threading import Lock
+from typing import Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+class RenderCache:
+    """In-memory LRU cache of rendered images.
+
+    The cache is bounded both by number of entries and by the total size of
+    the cached images; the least recently used entries are evicted first.
+    It is safe to share between threads.
+
+    :param int max_entries: Maximum number of cached images
+    :param int max_bytes: Maximum total size of the cached images. Images
+                    larger than this are never cached.
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached image for ``key`` or ``None``.
+
+        :param key: The cache key
+        :returns: the image data or ``None`` on a miss
+        """
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def set(self, key: Hashable, content: bytes) -> None:
+        """Store the image for ``key``, evicting old entries to make room.
+
+        :param key: The cache key
+        :param bytes content: The image data
+        """
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = content
+            self.size += len(content)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def set_file(self, key: Hashable, filename: str) -> None:
+        """Store the content of an image file for ``key`` if it fits.
+
+        :param key: The cache key
+        :param str filename: File holding the image data
+        """
+        if os.path.getsize(filename) <= self.max_bytes:
+            with open(filename, 'rb') as image:
+                self.set(key, image.read())
+
+    def clear(self) -> None:
+        """Remove every entry, the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    @property
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.size,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """Persistent cache of rendered images in a directory.
+
+    Each image is stored in a file named after the SHA-256 of its key.
+    Files are written to a temporary name and renamed into place, so
+    concurrent readers in other processes never see a partial image.
+    Reading an entry refreshes its modification time, and once the
+    directory grows past ``max_bytes`` the least recently used files are
+    removed, along with files older than ``max_age`` seconds.
+
+    :param str directory: The cache directory, created if missing
+    :param int max_bytes: Maximum total size of the cached images
+    :param float max_age: Optional maximum age of an entry in seconds
+    """
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, max_age: Optional[float] = None) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._written = 0
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: Hashable) -> str:
+        """Return the file that holds the entry for ``key``, whether or not
+        it exists.
+
+        :param key: The cache key
+        :returns: the path of the cache file
+        """
+        digest = sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get_path(self, key: Hashable) -> Optional[str]:
+        """Return the path of the cached image for ``key`` or ``None``, so a
+        hit can be streamed or copied without loading it in memory.
+
+        :param key: The cache key
+        :returns: the path of the cache file or ``None`` on a miss
+        """
+        filename = self.path(key)
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return filename
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached image for ``key`` or ``None``.
+
+        :param key: The cache key
+        :returns: the image data or ``None`` on a miss
+        """
+        filename = self.get_path(key)
+        if filename is None:
+            return None
+        try:
+            with open(filename, 'rb') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            # evicted by another process between the lookup and the read
+            return None
+
+    def set(self, key: Hashable, content: bytes) -> None:
+        """Atomically store the image for ``key``.
+
+        :param key: The cache key
+        :param bytes content: The image data
+        """
+        if len(content) <= self.max_bytes:
+            self._store(key, lambda out: out.write(content))
+
+    def set_file(self, key: Hashable, filename: str) -> None:
+        """Atomically store a copy of an image file for ``key``, without
+        loading it in memory.
+
+        :param key: The cache key
+        :param str filename: File holding the image data
+        """
+        if os.path.getsize(filename) <= self.max_bytes:
+            with open(filename, 'rb') as image:
+                self._store(key, lambda out: copyfileobj(image, out))
+
+    def evict(self) -> None:
+        """Remove expired entries and the least recently used ones until the
+        cache fits in ``max_bytes``. Skipped if another process is already
+        evicting.
+        """
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            with self._lock:
+                self._written = 0
+            entries = []
+            for filename in self._files():
+                try:
+                    stat = os.stat(filename)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            oldest = time.time() - self.max_age if self.max_age is not None else None
+            for mtime, size, filename in entries:
+                if total <= self.max_bytes and (oldest is None or mtime >= oldest):
+                    break
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._count('evictions')
+
+    def clear(self) -> None:
+        """Remove every entry, the counters are kept."""
+        for filename in self._files():
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters of this process."""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return os.path.exists(self.path(key))
+
+    def _store(self, key: Hashable, write) -> None:
+        filename = self.path(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        fd, tmp = mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                write(out)
+                size = out.tell()
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            self._written += size
+            due = self._written * 10 >= self.max_bytes
+        if due:
+            self.evict()
+
+    def _files(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    yield entry.path
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -0,0 +1,114 @@
+"""PlantUML rendering CLI
+
+Usage:
+    pyplantuml render <directory> [options]
+    pyplantuml watch <directory> [options]
+
+Options:
+    -h --help               Show this screen.
+    --out=<directory>       Directory the images are written to [default: <directory>]
+    --url=<url>             PlantUML server image CGI
+    --format=<format>       Output format [default: the one of --url]
+    --workers=<workers>     Number of renders in flight [default: 8]
+    --force                 Render every diagram even if unchanged
+    --interval=<seconds>    Seconds between two scans when polling [default: 0.25]
+    --debounce=<seconds>    Quiet time before a changed file is rendered [default: 0.1]
+    --include-path=<dir>    Directory searched for !include targets, repeatable
+    --mirror=<directory>    Cache of the !includeurl targets [default: <out>/.pyplantuml-mirror]
+    --offline               Only use the mirror for !includeurl targets
+    --no-resolve-includes   Leave the !include directives to the server
+"""
+
+import os
+import time
+from typing import List
+
+import typer
+
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi.cache import DiskCache
+from plantumlapi.plantumlapi.include import IncludeResolver
+from plantumlapi.plantumlapi.render import render_tree
+from plantumlapi.plantumlapi.watch import TreeWatcher
+
+DEFAULT_URL = 'http://www.plantuml.com/plantuml/img/'
+
+app = typer.Typer()
+
+MIRROR_NAME = '.pyplantuml-mirror'
+
+
+def make_resolver(resolve_includes: bool, include_path: List[str], mirror: str, offline: bool, out: str):
+    """Return the IncludeResolver configured by the command line options."""
+    if not resolve_includes:
+        return None
+    return IncludeResolver(include_path, DiskCache(mirror or os.path.join(out, MIRROR_NAME)), offline=offline)
+
+
+@app.command(
+    help='Render the PlantUML files of a directory, skipping the unchanged ones'
+)
+def render(
+    directory: str = typer.Argument(...),
+    out: str = typer.Option(None, help='Directory the images are written to, defaults to DIRECTORY'),
+    url: str = typer.Option(DEFAULT_URL, envvar='PLANTUML_URL', help='PlantUML server image CGI'),
+    format: str = typer.Option(None, help='Output format, defaults to the one of --url'),
+    workers: int = typer.Option(8, help='Number of renders in flight'),
+    force: bool = typer.Option(False, help='Render every diagram even if unchanged'),
+    include_path: List[str] = typer.Option([], help='Directory searched for !include targets'),
+    mirror: str = typer.Option(None, help='Cache of the !includeurl targets, defaults to OUT/.pyplantuml-mirror'),
+    offline: bool = typer.Option(False, help='Only use the mirror for !includeurl targets'),
+    resolve_includes: bool = typer.Option(True, help='Inline the !include directives before sending the diagrams'),
+) -> None:
+    """
+    Render the PlantUML files of a directory, skipping the unchanged ones
+    """
+    resolver = make_resolver(resolve_includes, include_path, mirror, offline, out or directory)
+    with PlantUML(url, max_connections=workers) as plantuml:
+        report = render_tree(plantuml, directory, out, format, max_workers=workers, force=force, resolver=resolver)
+    for source, error in report.failed.items():
+        typer.echo(f"{source}: {error}", err=True)
+    typer.echo(f"{len(report.rendered)} rendered, {len(report.unchanged)} unchanged, {len(report.removed)} removed, {len(report.failed)} failed")
+    if report.failed:
+        raise typer.Exit(code=1)
+
+
+@app.command(
+    help='Render the PlantUML files of a directory, then again each time one changes'
+)
+def watch(
+    directory: str = typer.Argument(...),
+    out: str = typer.Option(None, help='Directory the images are written to, defaults to DIRECTORY'),
+    url: str = typer.Option(DEFAULT_URL, envvar='PLANTUML_URL', help='PlantUML server image CGI'),
+    format: str = typer.Option(None, help='Output format, defaults to the one of --url'),
+    workers: int = typer.Option(4, help='Number of renders in flight'),
+    interval: float = typer.Option(0.25, help='Seconds between two scans when polling'),
+    debounce: float = typer.Option(0.1, help='Quiet time in seconds before a changed file is rendered'),
+    include_path: List[str] = typer.Option([], help='Directory searched for !include targets'),
+    mirror: str = typer.Option(None, help='Cache of the !includeurl targets, defaults to OUT/.pyplantuml-mirror'),
+    offline: bool = typer.Option(False, help='Only use the mirror for !includeurl targets'),
+    resolve_includes: bool = typer.Option(True, help='Inline the !include directives before sending the diagrams'),
+) -> None:
+    """
+    Render the PlantUML files of a directory, then again each time one changes
+    """
+    def on_render(source, error):
+        if error is None:
+            typer.echo(f"{source}: rendered")
+        else:
+            typer.echo(f"{source}: {error}", err=True)
+
+    resolver = make_resolver(resolve_includes, include_path, mirror, offline, out or directory)
+    with PlantUML(url, max_connections=workers) as plantuml:
+        watcher = TreeWatcher(plantuml, directory, out, format, interval=interval, debounce=debounce, max_workers=workers, on_render=on_render, resolver=resolver)
+        typer.echo(f"Watching {directory}, press Ctrl+C to stop")
+        with watcher:
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    app(prog_name='pyplantuml')
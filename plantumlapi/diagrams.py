@@ -1,12 +1,322 @@
+"""
+Diagram models.
+
+Each model generates its PlantUML markup line by line with :meth:`Diagram.draw`,
+so a model of any size can be written to a file or deflated and sent to
+the server without building the whole text in memory.
+
+Elements are given either as raw PlantUML lines (``str``) or as tuples
+whose fields depend on the diagram, e.g. ``(source, target, message)`` for
+the steps of a :class:`SequenceDiagram`. Tuples are stored as compact
+``__slots__`` records (:class:`Message`, :class:`Task`, ...) with interned
+names, and edges as arrays of node ids (:class:`EdgeList`), so models of
+millions of elements stay small.
+"""
+
+import json
+import re
+import sys
+from array import array
+from collections import defaultdict
+from hashlib import sha256
+from zlib import DEFLATED, MAX_WBITS, compressobj
+
+from plantumlapi.plantumlapi.encoding import encode, iter_chunks
+from plantumlapi.plantumlapi.split import HEADER_HEIGHT, LIMIT_SIZE, paginate, split_diagrams
+
+_IDENTIFIER = re.compile(r'^\w+$')
+# estimated height of a task row of a Gantt diagram, in pixels
+GANTT_ROW_HEIGHT = 20
+
+
+def quote(name) -> str:
+    """Quote a name for PlantUML unless it is a plain identifier."""
+    name = str(name)
+    return name if _IDENTIFIER.match(name) else f'"{name}"'
+
+
+def tree(nodes, edges):
+    """Generate the ``*`` depth prefixed lines of the trees described by
+    ``(parent, child)`` edges, as used by mind maps and WBS. Edge labels
+    have no place in a tree and are ignored.
+    """
+    children = defaultdict(list)
+    has_parent = set()
+    for parent, child, *_ in edges:
+        children[parent].append(child)
+        has_parent.add(child)
+    stack = [(node, 1) for node in reversed(nodes) if node not in has_parent]
+    while stack:
+        node, depth = stack.pop()
+        yield f"{'*' * depth} {node}"
+        stack.extend((child, depth + 1) for child in reversed(children.get(node, ())))
+
+
+def intern(name):
+    """Intern string names so repeated ones share a single object."""
+    return sys.intern(name) if type(name) is str else name
+
+
+class Participant:
+    __slots__ = ('name', 'kind')
+
+    def __init__(self, name: str, kind: str = 'participant') -> None:
+        self.name = intern(name)
+        self.kind = intern(kind)
+
+    def draw(self):
+        yield f'{self.kind} {quote(self.name)}'
+
+
+class Message:
+    __slots__ = ('source', 'target', 'text', 'arrow')
+
+    def __init__(self, source: str, target: str, text: str = '', arrow: str = '->') -> None:
+        self.source = intern(source)
+        self.target = intern(target)
+        self.text = text
+        self.arrow = intern(arrow)
+
+    def draw(self):
+        yield f'{quote(self.source)} {self.arrow} {quote(self.target)}' + (f' : {self.text}' if self.text else '')
+
+
+class Node:
+    __slots__ = ('name', 'kind')
+
+    def __init__(self, name: str, kind: str = 'node') -> None:
+        self.name = intern(name)
+        self.kind = intern(kind)
+
+    def draw(self):
+        yield f'{self.kind} {quote(self.name)}'
+
+
+class Entity:
+    __slots__ = ('name', 'attributes')
+
+    def __init__(self, name: str, attributes: dict = None) -> None:
+        self.name = intern(name)
+        self.attributes = {intern(attribute): intern(data_type) for attribute, data_type in (attributes or {}).items()}
+
+    def draw(self):
+        if not self.attributes:
+            yield f'entity {quote(self.name)}'
+            return
+        yield f'entity {quote(self.name)} {{'
+        for attribute, data_type in self.attributes.items():
+            yield f'  {attribute} : {data_type}'
+        yield '}'
+
+
+class Relationship:
+    __slots__ = ('source', 'target', 'label', 'arrow')
+
+    def __init__(self, source: str, target: str, label: str = None, arrow: str = '--') -> None:
+        self.source = intern(source)
+        self.target = intern(target)
+        self.label = label
+        self.arrow = intern(arrow)
+
+    def draw(self):
+        yield f'{quote(self.source)} {self.arrow} {quote(self.target)}' + (f' : {self.label}' if self.label else '')
+
+
+class Task:
+    __slots__ = ('name', 'days', 'after')
+
+    def __init__(self, name: str, days: int, after: str = None) -> None:
+        self.name = intern(name)
+        self.days = days
+        self.after = intern(after)
+
+    def draw(self):
+        yield f'[{self.name}] lasts {self.days} days'
+        if self.after is not None:
+            yield f"[{self.name}] starts at [{self.after}]'s end"
+
+
+def record(element, factory):
+    """Return a raw line or record as is, build a record from a tuple."""
+    if isinstance(element, str) or hasattr(element, 'draw'):
+        return element
+    return factory(*element)
+
+
+def draw_elements(elements):
+    """Generate the lines of raw lines and records."""
+    for element in elements:
+        if isinstance(element, str):
+            yield element
+        else:
+            yield from element.draw()
+
+
+class EdgeList:
+    """Edges between named nodes, stored as two arrays of node ids.
+
+    Each node name is kept once, in ``nodes``; an edge costs 8 bytes plus
+    its label if it has one. Iterating yields ``(source, target)`` tuples,
+    or ``(source, target, label)`` for labelled edges.
+
+    :param nodes: Initial node names
+    :param edges: Initial ``(source, target[, label])`` edges
+    """
+    __slots__ = ('nodes', 'ids', 'sources', 'targets', 'labels')
+
+    def __init__(self, nodes=(), edges=()) -> None:
+        self.nodes = []
+        self.ids = {}
+        self.sources = array('I')
+        self.targets = array('I')
+        self.labels = {}
+        for node in nodes:
+            self.node_id(node)
+        for edge in edges:
+            self.append(edge)
+
+    def node_id(self, name) -> int:
+        """Return the id of a node, adding it if it is new."""
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = self.ids[intern(name)] = len(self.nodes)
+            self.nodes.append(intern(name))
+        return node_id
+
+    def append(self, edge) -> None:
+        source, target, *label = edge
+        if label and label[0] is not None:
+            self.labels[len(self.sources)] = label[0]
+        self.sources.append(self.node_id(source))
+        self.targets.append(self.node_id(target))
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self.sources)
+        edge = (self.nodes[self.sources[index]], self.nodes[self.targets[index]])
+        return edge + (self.labels[index],) if index in self.labels else edge
+
+    def __iter__(self):
+        nodes, labels = self.nodes, self.labels
+        for index, (source, target) in enumerate(zip(self.sources, self.targets)):
+            if labels and index in labels:
+                yield nodes[source], nodes[target], labels[index]
+            else:
+                yield nodes[source], nodes[target]
+
+
 class Diagram:
+    start = 'uml'
+    titled = True
+
     def __init__(self, name):
         self.name = name
 
     def draw(self):
+        """Generate the PlantUML markup of the diagram, one line at a time."""
+        yield f'@start{self.start}'
+        if self.titled and self.name:
+            yield f'title {self.name}'
+        yield from self.body()
+        yield f'@end{self.start}'
+
+    def body(self):
+        """Generate the lines between the ``@start`` and ``@end`` lines."""
         raise NotImplementedError
 
-    def export(self, format):
-        raise NotImplementedError
+    def touch(self) -> None:
+        """Mark the diagram as changed, dropping its memoized text, hash
+        and encoding. The ``add_*`` methods call it; call it after
+        changing the elements directly.
+        """
+        self.__dict__.pop('_memo', None)
+
+    def _cached(self, key, compute):
+        memo = self.__dict__.setdefault('_memo', {})
+        if key not in memo:
+            memo[key] = compute()
+        return memo[key]
+
+    def summary(self):
+        """Return the size in bytes, sha256 hex digest and deflated and
+        encoded form of the markup, computed in one streaming pass and
+        memoized until the diagram changes.
+        """
+        def compute():
+            deflater = compressobj(-1, DEFLATED, -MAX_WBITS)
+            digest, size, deflated = sha256(), 0, []
+            for chunk in iter_chunks(self.draw()):
+                data = chunk.encode('utf-8')
+                digest.update(data)
+                size += len(data)
+                deflated.append(deflater.compress(data))
+            deflated.append(deflater.flush())
+            return size, digest.hexdigest(), encode(b''.join(deflated))
+
+        return self._cached('summary', compute)
+
+    def digest(self) -> str:
+        """Return the sha256 hex digest of the markup, memoized."""
+        return self.summary()[1]
+
+    def get_url(self, plantuml, format=None) -> str:
+        """Return the image URL of the diagram on a server, without
+        deflating or encoding it again while it is unchanged.
+        """
+        return f'{plantuml.endpoint(format)}/{self.summary()[2]}'
+
+    def write_to(self, fileobj, chunk_size: int = 64 * 1024) -> None:
+        """Write the PlantUML markup to a text file object in chunks of
+        about ``chunk_size`` characters.
+        """
+        for chunk in iter_chunks(self.draw(), chunk_size):
+            fileobj.write(chunk)
+
+    def text(self) -> str:
+        """Return the PlantUML markup as one string, memoized."""
+        return self._cached('text', lambda: ''.join(iter_chunks(self.draw())))
+
+    def export(self, format, plantuml):
+        """Render the diagram, streaming its markup to the server.
+
+        The memoized :meth:`summary` is used, so rendering an unchanged
+        diagram neither deflates nor encodes it again, and with a render
+        cache on ``plantuml`` makes no request either.
+
+        :param str format: Output format
+        :param plantuml: The PlantUML client used to render
+        :returns: the raw image data
+        """
+        size, digest, encoded = self.summary()
+        if plantuml.post_threshold is None or size <= plantuml.post_threshold:
+            return plantuml.process(None, format, encoded=encoded)[0]
+        return plantuml.process_lines(self.draw, format, size=size, digest=digest)[0]
+
+    def pages(self, limit: int = LIMIT_SIZE) -> list:
+        """Return the markup of the diagram split into diagrams estimated
+        to fit in ``limit`` pixels, the ``PUML_LIMIT_SIZE`` of the server,
+        memoized. Long sequence diagrams are broken with ``newpage``, see
+        :func:`plantumlapi.plantumlapi.split.paginate`; other diagrams are
+        kept whole.
+        """
+        return self._cached(('pages', limit), lambda: [diagram.text for diagram in split_diagrams(paginate(self.draw(), limit), pages=True)])
+
+    def export_pages(self, format, plantuml, limit: int = LIMIT_SIZE, max_workers: int = 8) -> list:
+        """Render the :meth:`pages` of the diagram concurrently, so a
+        diagram too large for the server comes back whole in one pass.
+
+        :param str format: Output format
+        :param plantuml: The PlantUML client used to render
+        :param int limit: Size budget of a page in pixels
+        :param int max_workers: Number of pages rendered at once
+        :returns: list of the raw image data of the pages, in order
+        :raises: the error of the first page that failed
+        """
+        results = plantuml.process_many(self.pages(limit), max_workers=max_workers, return_exceptions=False, format=format)
+        return [content for content, _ in results]
 
     def __str__(self):
         return self.name
@@ -16,18 +326,22 @@ class Diagram:
 
 
 class SequenceDiagram(Diagram):
-    def __init__(self, name: str, steps: list):
+    def __init__(self, name: str, steps: list, participants: list = None):
         self.name = name
-        self.steps = steps
+        self.steps = [record(step, Message) for step in steps]
+        self.participants = [record(participant, Participant) for participant in participants or ()]
 
-    def add_step(self, step):
-        self.steps.append(step)
+    def add_participant(self, participant):
+        self.participants.append(record(participant, Participant))
+        self.touch()
 
-    def draw(self):
-        pass
+    def add_step(self, step):
+        self.steps.append(record(step, Message))
+        self.touch()
 
-    def export(self, format):
-        pass
+    def body(self):
+        yield from draw_elements(self.participants)
+        yield from draw_elements(self.steps)
 
     def __str__(self):
         return f"Sequence Diagram: {self.name} with {len(self.steps)} steps"
@@ -42,12 +356,10 @@ class UseCaseDiagram(Diagram):
 
     def add_description(self, description: str):
         self.description = description
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from self.description.splitlines()
 
     def __str__ (self):
         return f"Use Case Diagram: {self.name}, {self.description}"
@@ -58,6 +370,9 @@ class UseCaseDiagram(Diagram):
 
 class ClassDiagram(Diagram):
     class Class:
+        # the diagram to mark as changed when the class is
+        owner = None
+
         def __init__(self, name: str, attributes: dict, methods: dict):
             self.name = name
             self.attributes = attributes
@@ -65,9 +380,22 @@ class ClassDiagram(Diagram):
 
         def add_attribute(self, name: str, data_type: str):
             self.attributes[name] = data_type
+            if self.owner is not None:
+                self.owner.touch()
 
         def add_method(self, name: str, parameters: dict, return_type: str):
             self.methods[name] = {'parameters': parameters, 'return_type': return_type}
+            if self.owner is not None:
+                self.owner.touch()
+
+        def draw(self):
+            yield f'class {quote(self.name)} {{'
+            for name, data_type in self.attributes.items():
+                yield f'  {name} : {data_type}'
+            for name, method in self.methods.items():
+                parameters = ', '.join(f'{parameter} : {data_type}' for parameter, data_type in method['parameters'].items())
+                yield f"  {name}({parameters}) : {method['return_type']}"
+            yield '}'
 
         def __str__(self):
             return f"Class: {self.name} with {len(self.attributes)} attributes and {len(self.methods)} methods"
@@ -78,15 +406,17 @@ class ClassDiagram(Diagram):
     def __init__(self, name: str, classes: dict):
         self.name = name
         self.classes = classes
+        for class_ in classes.values():
+            class_.owner = self
 
     def add_class(self, class_):
+        class_.owner = self
         self.classes[class_.name] = class_
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        for class_ in self.classes.values():
+            yield from class_.draw()
 
     def __str__(self):
         return f"Class Diagram: {self.name} with {len(self.classes)} classes"
@@ -102,12 +432,13 @@ class ActivityDiagram(Diagram):
 
     def add_step(self, step):
         self.steps.append(step)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield 'start'
+        for step in self.steps:
+            yield f':{step};'
+        yield 'stop'
 
     def __str__(self):
         return f"Activity Diagram: {self.name} with {len(self.steps)} steps"
@@ -122,12 +453,15 @@ class ComponentDiagram(Diagram):
 
     def add_dependency(self, dependency):
         self.dependencies.append(dependency)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        for dependency in self.dependencies:
+            if isinstance(dependency, str):
+                yield dependency
+            else:
+                source, target, *label = dependency
+                yield f"[{source}] --> [{target}]" + (f" : {label[0]}" if label else '')
 
     def __str__(self):
         return f"Component Diagram: {self.name} with {len(self.dependencies)} dependencies"
@@ -142,12 +476,10 @@ class StateDiagram(Diagram):
 
     def add_description(self, description: str):
         self.description = description
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from self.description.splitlines()
 
     def __str__(self):
         return f"State Diagram: {self.name}, {self.description}"
@@ -162,12 +494,13 @@ class ObjectDiagram(Diagram):
 
     def add_attribute(self, name: str, value):
         self.attributes[name] = value
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield f'object {quote(self.name)} {{'
+        for name, value in self.attributes.items():
+            yield f'  {name} = {value}'
+        yield '}'
 
     def __str__(self):
         return f"Object Diagram: {self.name} with {len(self.attributes)} attributes"
@@ -178,16 +511,21 @@ class ObjectDiagram(Diagram):
 class DeploymentDiagram(Diagram):
     def __init__(self, name: str, nodes: list):
         self.name = name
-        self.nodes = nodes
+        self.nodes = []
+        for node in nodes:
+            self.add_node(node)
 
     def add_node(self, node):
+        if isinstance(node, str):
+            node = Node(node)
+        elif not isinstance(node, Node):
+            kind, name = node
+            node = Node(name, kind)
         self.nodes.append(node)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from draw_elements(self.nodes)
 
     def __str__(self):
         return f"Deployment: {self.name} with {len(self.nodes)} nodes"
@@ -202,6 +540,10 @@ class TimingDiagram(Diagram):
 
     def add_event(self, event):
         self.events.append(event)
+        self.touch()
+
+    def body(self):
+        yield from self.events
 
     def __str__(self):
         return f"Timing: {self.name} with {len(self.events)} events"
@@ -212,20 +554,26 @@ class TimingDiagram(Diagram):
 class NetworkDiagram(Diagram):
     def __init__(self, name: str, nodes: list, edges: list):
         self.name = name
-        self.nodes = nodes
-        self.edges = edges
+        self.edges = EdgeList(nodes, edges)
+
+    @property
+    def nodes(self):
+        return self.edges.nodes
 
     def add_node(self, node):
-        self.nodes.append(node)
+        self.edges.node_id(node)
+        self.touch()
 
     def add_edge(self, edge):
         self.edges.append(edge)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        for node in self.nodes:
+            yield f'node {quote(node)}'
+        for edge in self.edges:
+            source, target, *label = edge
+            yield f"{quote(source)} -- {quote(target)}" + (f" : {label[0]}" if label else '')
 
     def __str__(self):
         return f"Network: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
@@ -234,18 +582,21 @@ class NetworkDiagram(Diagram):
         return f"Network: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
 
 class WireframeDiagram(Diagram):
+    start = 'salt'
+    titled = False
+
     def __init__(self, name: str, elements: list):
         self.name = name
         self.elements = elements
 
     def add_element(self, element):
         self.elements.append(element)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield '{'
+        yield from self.elements
+        yield '}'
 
     def __str__(self):
         return f"Wireframe: {self.name} with {len(self.elements)} elements"
@@ -259,12 +610,10 @@ class ArchimateDiagram(Diagram):
         self.components = components
     def add_component(self, component):
         self.components.append(component)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from self.components
 
     def __str__(self):
         return f"Archimate: {self.name} with {len(self.components)} components"
@@ -273,18 +622,53 @@ class ArchimateDiagram(Diagram):
         return f"Archimate: {self.name} with {len(self.components)} components"
 
 class GanttDiagram(Diagram):
+    start = 'gantt'
+
     def __init__(self, name: str, tasks: list):
         self.name = name
-        self.tasks = tasks
+        self.tasks = [record(task, Task) for task in tasks]
 
     def add_task(self, task):
-        self.tasks.append(task)
-
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+        self.tasks.append(record(task, Task))
+        self.touch()
+
+    def body(self):
+        yield from draw_elements(self.tasks)
+
+    def pages(self, limit: int = LIMIT_SIZE) -> list:
+        """Split the tasks into Gantt diagrams of the rows estimated to fit
+        in ``limit`` pixels. A task starting after the end of a task of an
+        earlier page starts at the same day offset instead, so the pages
+        share one timeline.
+        """
+        per_page = max(1, (limit - HEADER_HEIGHT) // GANTT_ROW_HEIGHT)
+        if len(self.tasks) <= per_page:
+            return [self.text()]
+
+        def compute():
+            ends, starts = {}, {}
+            for task in self.tasks:
+                if not isinstance(task, str):
+                    starts[task.name] = ends.get(task.after, 0)
+                    ends[task.name] = starts[task.name] + task.days
+            groups = [self.tasks[i:i + per_page] for i in range(0, len(self.tasks), per_page)]
+            texts = []
+            for number, group in enumerate(groups, 1):
+                names = {task.name for task in group if not isinstance(task, str)}
+                lines = ['@startgantt']
+                if self.name:
+                    lines.append(f'title {self.name} ({number}/{len(groups)})')
+                for task in group:
+                    if isinstance(task, str) or task.after is None or task.after in names:
+                        lines.extend(draw_elements([task]))
+                    else:
+                        lines.append(f'[{task.name}] lasts {task.days} days')
+                        lines.append(f'[{task.name}] starts D+{starts[task.name]}')
+                lines.append('@endgantt')
+                texts.append('\n'.join(lines) + '\n')
+            return texts
+
+        return self._cached(('pages', limit), compute)
 
     def __str__(self):
         return f"Gantt: {self.name} with {len(self.tasks)} tasks"
@@ -292,23 +676,27 @@ class GanttDiagram(Diagram):
     def __repr__(self):
         return f"Gantt: {self.name} with {len(self.tasks)} tasks"
 
-class MindMap:
+class MindMap(Diagram):
+    start = 'mindmap'
+
     def __init__(self, name: str, nodes: list, edges: list):
         self.name = name
-        self.nodes = nodes
-        self.edges = edges
+        self.edges = EdgeList(nodes, edges)
+
+    @property
+    def nodes(self):
+        return self.edges.nodes
 
     def add_node(self, node):
-        self.nodes.append(node)
+        self.edges.node_id(node)
+        self.touch()
 
     def add_edge(self, edge):
         self.edges.append(edge)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from tree(self.nodes, self.edges)
 
     def __str__(self):
         return f"Mind Map: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
@@ -316,19 +704,24 @@ class MindMap:
     def __repr__(self):
         return f"Mind Map: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
 
-class WBS:
+class WBS(Diagram):
+    start = 'wbs'
+
     def __init__(self, name: str, tasks: list):
         self.name = name
         self.tasks = tasks
 
     def add_task(self, task):
         self.tasks.append(task)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        for task in self.tasks:
+            if isinstance(task, str):
+                yield task
+            else:
+                depth, name = task
+                yield f"{'*' * depth} {name}"
 
     def __str__(self):
         return f"WBS: {self.name} with {len(self.tasks)} tasks"
@@ -336,23 +729,25 @@ class WBS:
     def __repr__(self):
         return f"WBS: {self.name} with {len(self.tasks)} tasks"
 
-class ERD:
+class ERD(Diagram):
     def __init__(self, name: str, entities: list, relationships: list):
         self.name = name
-        self.entities = entities
-        self.relationships = relationships
+        self.entities = []
+        self.relationships = [record(relationship, Relationship) for relationship in relationships]
+        for entity in entities:
+            self.add_entity(entity)
 
     def add_entity(self, entity):
-        self.entities.append(entity)
+        self.entities.append(Entity(entity) if isinstance(entity, str) else record(entity, Entity))
+        self.touch()
 
     def add_relationship(self, relationship):
-        self.relationships.append(relationship)
-
-    def draw(self):
-        pass
+        self.relationships.append(record(relationship, Relationship))
+        self.touch()
 
-    def export(self, format):
-        pass
+    def body(self):
+        yield from draw_elements(self.entities)
+        yield from draw_elements(self.relationships)
 
     def __str__(self):
         return f"ERD: {self.name} with {len(self.entities)} entities and {len(self.relationships)} relationships"
@@ -360,23 +755,27 @@ class ERD:
     def __repr__(self):
         return f"ERD: {self.name} with {len(self.entities)} entities and {len(self.relationships)} relationships"
 
-class OrgChart:
+class OrgChart(Diagram):
+    start = 'wbs'
+
     def __init__(self, name: str, nodes: list, edges: list):
         self.name = name
-        self.nodes = nodes
-        self.edges = edges
+        self.edges = EdgeList(nodes, edges)
+
+    @property
+    def nodes(self):
+        return self.edges.nodes
 
     def add_node(self, node):
-        self.nodes.append(node)
+        self.edges.node_id(node)
+        self.touch()
 
     def add_edge(self, edge):
         self.edges.append(edge)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from tree(self.nodes, self.edges)
 
     def __str__(self):
         return f"Org Chart: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
@@ -384,19 +783,17 @@ class OrgChart:
     def __repr__(self):
         return f"Org Chart: {self.name} with {len(self.nodes)} nodes and {len(self.edges)} edges"
 
-class BPMN:
+class BPMN(Diagram):
     def __init__(self, name: str, elements: list):
         self.name = name
         self.elements = elements
 
     def add_element(self, element):
         self.elements.append(element)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield from self.elements
 
     def __str__(self):
         return f"BPMN: {self.name} with {len(self.elements)} elements"
@@ -404,27 +801,33 @@ class BPMN:
     def __repr__(self):
         return f"BPMN: {self.name} with {len(self.elements)} elements"
 
-class Usecase:
+class Usecase(Diagram):
     def __init__(self, name: str, actors: list, usecases: list, relationships: list):
         self.name = name
         self.actors = actors
         self.usecases = usecases
-        self.relationships = relationships
+        self.relationships = EdgeList(edges=relationships)
 
     def add_actor(self, actor):
         self.actors.append(actor)
+        self.touch()
 
     def add_usecase(self, usecase):
         self.usecases.append(usecase)
+        self.touch()
 
     def add_relationship(self, relationship):
         self.relationships.append(relationship)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        for actor in self.actors:
+            yield f'actor {quote(actor)}'
+        for usecase in self.usecases:
+            yield f'usecase ({usecase})'
+        for relationship in self.relationships:
+            source, target, *label = relationship
+            yield f"{quote(source)} --> {quote(target)}" + (f" : {label[0]}" if label else '')
 
     def __str__(self):
         return f"Usecase: {self.name} with {len(self.actors)} actors, {len(self.usecases)} usecases and {len(self.relationships)} relationships"
@@ -432,19 +835,20 @@ class Usecase:
     def __repr__(self):
         return f"Usecase: {self.name} with {len(self.actors)} actors, {len(self.usecases)} usecases and {len(self.relationships)} relationships"
 
-class Flowchart:
+class Flowchart(Diagram):
     def __init__(self, name: str, elements: list):
         self.name = name
         self.elements = elements
 
     def add_element(self, element):
         self.elements.append(element)
+        self.touch()
 
-    def draw(self):
-        pass
-
-    def export(self, format):
-        pass
+    def body(self):
+        yield 'start'
+        for element in self.elements:
+            yield f':{element};'
+        yield 'stop'
 
     def __str__(self):
         return f"Flowchart: {self.name} with {len(self.elements)} elements"
@@ -452,34 +856,61 @@ class Flowchart:
     def __repr__(self):
         return f"Flowchart: {self.name} with {len(self.elements)} elements"
 
-class DataFlow:
+class DataFlow(Diagram):
     def __init__(self, name: str, processes: list, datastores: list, dataflows: list):
         self.name = name
         self.processes = processes
         self.datastores = datastores
-        self.dataflows = dataflows
+        self.dataflows = EdgeList(edges=dataflows)
 
     def add_process(self, process):
         self.processes.append(process)
+        self.touch()
 
     def add_datastore(self, datastore):
         self.datastores.append(datastore)
+        self.touch()
 
     def add_dataflow(self, dataflow):
         self.dataflows.append(dataflow)
+        self.touch()
+
+    def body(self):
+        for process in self.processes:
+            yield f'usecase ({process})'
+        for datastore in self.datastores:
+            yield f'database {quote(datastore)}'
+        for dataflow in self.dataflows:
+            source, target, *label = dataflow
+            yield f"{quote(source)} --> {quote(target)}" + (f" : {label[0]}" if label else '')
+
+class JSONDiagram(Diagram):
+    start = 'json'
+    titled = False
 
-class JSONDiagram:
     def __init__(self, name: str, data: dict):
         self.name = name
         self.data = data
 
     def add_data(self, key: str, value):
         self.data[key] = value
+        self.touch()
+
+    def body(self):
+        yield from json.dumps(self.data, indent=2, default=str).splitlines()
+
+class YAMLDiagram(Diagram):
+    start = 'yaml'
+    titled = False
 
-class YAMLDiagram:
     def __init__(self, name: str, data: dict):
         self.name = name
         self.data = data
 
     def add_data(self, key: str, value):
         self.data[key] = value
+        self.touch()
+
+    def body(self):
+        # JSON is valid YAML, and needs no YAML library
+        yield from json.dumps(self.data, indent=2, default=str).splitlines()
@@ -19,6 +19,7 @@ import docker
 import logging
 
 from . import __version_string__
+from .split import LIMIT_SIZE
 
 app = typer.Typer()
 logger = logging.getLogger(__name__)
@@ -58,7 +59,7 @@ def start_server(
         detach=True,
         ports={8080: port},
         environment={
-            'PUML_LIMIT_SIZE': 8192
+            'PUML_LIMIT_SIZE': LIMIT_SIZE
         }
     )
     typer.echo(f"PlantUML Server started on http://{host}:{port}")
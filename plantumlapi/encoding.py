@@ -0,0 +1,230 @@
+"""
+PlantUML text encoding.
+
+The PlantUML server expects diagram source deflated and then encoded with a
+base64 variant that uses the alphabet ``0-9A-Za-z-_``. This module maps the
+standard base64 alphabet onto that one with a single ``bytes.translate`` so
+whole buffers are encoded in C instead of three bytes at a time, and does
+the reverse to turn encoded URLs back into plantuml text.
+"""
+
+import os
+from base64 import b64encode, b64decode
+from binascii import Error as BinasciiError
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+from zlib import compress, decompressobj, error as ZlibError
+
+from plantumlapi.plantumlapi.errors import PlantUMLError
+
+# Standard base64 alphabet (plus the '=' pad) and its PlantUML counterpart.
+# Padding becomes '0', which is what a zero-filled 6-bit group encodes to.
+_B64_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='
+_PLANTUML_ALPHABET = b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-_0'
+
+_ENCODE_TABLE = bytes.maketrans(_B64_ALPHABET, _PLANTUML_ALPHABET)
+_DECODE_TABLE = bytes.maketrans(_PLANTUML_ALPHABET[:-1], _B64_ALPHABET[:-1])
+
+# Prefixes the server accepts in front of the encoded text: '~1' marks the
+# deflate encoding used here, '~h' a plain hex encoding of the source.
+_DEFLATE_PREFIX = '~1'
+_HEX_PREFIX = '~h'
+
+# Output formats served by the plantuml server and their file extension.
+FORMATS = {
+    'img': '.png',
+    'png': '.png',
+    'svg': '.svg',
+    'txt': '.txt',
+    'utxt': '.txt',
+    'pdf': '.pdf',
+    'eps': '.eps',
+}
+
+
+class PlantUMLURL(NamedTuple):
+    """The parts of a plantuml server image URL.
+
+    ``server`` is everything before the output format segment, ``format``
+    the format segment itself (``img``, ``png``, ``svg``, ...) and
+    ``encoded`` the encoded diagram.
+    """
+    server: str
+    format: str
+    encoded: str
+
+
+def encode(data: bytes) -> str:
+    """Encode bytes in the PlantUML base64 variant.
+
+    :param bytes data: The data to encode, usually deflated plantuml text
+    :returns: The encoded data
+    """
+    return b64encode(data).translate(_ENCODE_TABLE).decode('ascii')
+
+
+def deflate(plantuml_text: str) -> bytes:
+    """Raw deflate the plantuml text, without the zlib header and checksum.
+
+    :param str plantuml_text: The plantuml markup to compress
+    :returns: The deflated markup
+    """
+    return compress(plantuml_text.encode('utf-8'))[2:-4]
+
+
+def deflate_and_encode(plantuml_text: str) -> str:
+    """zlib compress the plantuml text and encode it for the plantuml server.
+
+    :param str plantuml_text: The plantuml markup to render
+    :returns: The encoded plantuml markup
+    """
+    return encode(deflate(plantuml_text))
+
+
+def iter_chunks(lines, chunk_size: int = 64 * 1024):
+    """Join lines into newline terminated chunks of about ``chunk_size``
+    characters, so a large text can be written or compressed piecewise
+    without building it whole.
+
+    :param lines: Iterable of lines without their line ending
+    :param int chunk_size: Target size of the chunks
+    :returns: generator of strings
+    """
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            chunk.append('')
+            yield '\n'.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        chunk.append('')
+        yield '\n'.join(chunk)
+
+
+def _deflate_and_encode_below(max_size: int, plantuml_text: str) -> Optional[str]:
+    if len(plantuml_text.encode('utf-8')) > max_size:
+        return None
+    return deflate_and_encode(plantuml_text)
+
+
+def encode_many(plantuml_texts, processes: Optional[int] = None, chunksize: int = 256, max_size: Optional[int] = None):
+    """Deflate and encode many plantuml texts over a pool of processes.
+
+    deflate and encode hold the GIL, so for very large batches they are
+    spread over ``processes`` worker processes in chunks of ``chunksize``
+    texts. The input is consumed a window of chunks at a time, so it can
+    be a lazy iterator.
+
+    :param plantuml_texts: Iterable of plantuml markup
+    :param int processes: Number of worker processes, defaults to the
+                    number of CPUs. ``1`` encodes in the current process.
+    :param int chunksize: Number of texts sent to a worker at once
+    :param int max_size: Texts larger than this many bytes are not encoded
+                    and yield ``None`` instead.
+    :returns: generator of the encoded texts, in input order
+    """
+    encode_one = deflate_and_encode if max_size is None else partial(_deflate_and_encode_below, max_size)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        yield from map(encode_one, plantuml_texts)
+        return
+    plantuml_texts = iter(plantuml_texts)
+    window = 2 * processes * chunksize
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        while batch := list(islice(plantuml_texts, window)):
+            yield from executor.map(encode_one, batch, chunksize=chunksize)
+
+
+def decode(encoded: str) -> bytes:
+    """Decode data encoded in the PlantUML base64 variant.
+
+    :param str encoded: The encoded data
+    :returns: The decoded bytes, including any zero padding of the last group
+    :raises: PlantUMLError if ``encoded`` is not valid PlantUML encoding
+    """
+    try:
+        data = encoded.encode('ascii').translate(_DECODE_TABLE)
+        return b64decode(data + b'=' * (-len(data) % 4), validate=True)
+    except (UnicodeEncodeError, BinasciiError) as e:
+        raise PlantUMLError(f"Invalid PlantUML encoding: {e}") from e
+
+
+def inflate(data: bytes) -> str:
+    """Inflate raw deflated plantuml text.
+
+    Trailing bytes after the end of the deflate stream, such as the padding
+    added by :func:`encode`, are ignored.
+
+    :param bytes data: The deflated markup
+    :returns: The plantuml markup
+    :raises: PlantUMLError if ``data`` is not a valid deflate stream
+    """
+    decompressor = decompressobj(-15)
+    try:
+        text = decompressor.decompress(data) + decompressor.flush()
+    except ZlibError as e:
+        raise PlantUMLError(f"Invalid deflate data: {e}") from e
+    return text.decode('utf-8')
+
+
+def decode_and_inflate(encoded: str) -> str:
+    """Turn an encoded diagram back into plantuml text.
+
+    This is the inverse of :func:`deflate_and_encode` and also accepts the
+    ``~1`` (deflate) and ``~h`` (hex) prefixes understood by the server.
+
+    :param str encoded: The encoded plantuml markup
+    :returns: The plantuml markup
+    :raises: PlantUMLError if ``encoded`` can not be decoded
+    """
+    if encoded.startswith(_HEX_PREFIX):
+        try:
+            return bytes.fromhex(encoded[len(_HEX_PREFIX):]).decode('utf-8')
+        except ValueError as e:
+            raise PlantUMLError(f"Invalid hex encoding: {e}") from e
+    if encoded.startswith(_DEFLATE_PREFIX):
+        encoded = encoded[len(_DEFLATE_PREFIX):]
+    return inflate(decode(encoded))
+
+
+def parse_url(url: str) -> PlantUMLURL:
+    """Split a plantuml server image URL into server, format and encoded text.
+
+    :param str url: URL such as ``http://www.plantuml.com/plantuml/img/SyfF...``
+    :returns: a :class:`PlantUMLURL`
+    :raises: PlantUMLError if the URL has no format and encoded segments
+    """
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if len(segments) < 2:
+        raise PlantUMLError(f"Not a PlantUML image URL: {url}")
+    server = urlunsplit((parts.scheme, parts.netloc, '/'.join([''] + segments[:-2]), '', ''))
+    return PlantUMLURL(server, segments[-2], segments[-1])
+
+
+def split_endpoint(url: str):
+    """Split a plantuml server endpoint URL into the server URL and the
+    output format.
+
+    :param str url: URL such as ``http://www.plantuml.com/plantuml/img/``
+    :returns: ``(server, format)``, format is ``None`` if the URL does not
+              end with a known output format
+    """
+    server, _, output_format = url.rstrip('/').rpartition('/')
+    if output_format in FORMATS:
+        return server, output_format
+    return url.rstrip('/'), None
+
+
+def text_from_url(url: str) -> str:
+    """Return the plantuml markup embedded in a plantuml server image URL.
+
+    :param str url: The plantuml server image URL
+    :returns: The plantuml markup
+    """
+    return decode_and_inflate(parse_url(url).encoded)
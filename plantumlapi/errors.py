@@ -28,3 +28,17 @@ class PlantUMLHTTPError(Exception):
         self.url = self.url.url if self.url else "unknown URL"
         self.message = f"HTTP Error : {self.url} {response}"
         super(PlantUMLHTTPError, self).__init__(self.message)
+
+
+class PlantUMLTimeoutError(PlantUMLError):
+    """
+    A render did not complete before its deadline.
+    """
+    pass
+
+
+class PlantUMLCircuitOpenError(PlantUMLConnectionError):
+    """
+    Request not sent because the server's circuit breaker is open.
+    """
+    pass
@@ -0,0 +1,184 @@
+"""
+Client side resolution of ``!include`` directives.
+
+The PlantUML server can only include files it can read itself, and fetches
+``!includeurl`` targets on every render. :class:`IncludeResolver` inlines
+them before the text is sent instead: local files are read relative to the
+including file or an include path, remote ones are served from a local
+mirror and only downloaded once. Every file a diagram pulled in is
+recorded, so a rebuild knows which diagrams a change to a shared file
+affects.
+"""
+
+import os
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import urljoin
+
+import httpx
+
+from plantumlapi.plantumlapi.errors import PlantUMLConnectionError, PlantUMLError
+from plantumlapi.plantumlapi.split import START, split_diagrams
+
+_INCLUDE = re.compile(r'^\s*!(include|include_many|include_once|includeurl|includesub)\s+(.+?)\s*$')
+_DEFINE = re.compile(r'^\s*!define\s+(\w+)\s+(.+?)\s*$')
+_VARIABLE = re.compile(r'^\s*!(?:global\s+|local\s+)?(\$\w+)\s*\??=\s*(["\'])(.*)\2\s*$')
+_STARTSUB = re.compile(r'^\s*!startsub\s+(\w+)\s*$')
+_ENDSUB = re.compile(r'^\s*!endsub\s*$')
+
+
+def is_url(location: str) -> bool:
+    return location.startswith(('http://', 'https://'))
+
+
+class Resolved(NamedTuple):
+    """A plantuml text with its includes inlined.
+
+    ``includes`` lists every file path and URL it pulled in, directly or
+    not, in the order they were first included.
+    """
+    text: str
+    includes: list
+
+
+class IncludeResolver:
+    """Inline the ``!include``, ``!include_many``, ``!include_once``,
+    ``!includeurl`` and ``!includesub`` directives of plantuml texts.
+
+    Targets may use names set earlier with ``!define NAME value`` or
+    ``!$name = "value"``, as with the AWS icons ``AWSPuml`` prefix. A
+    ``file!N`` target selects the N-th diagram of the file and
+    ``file!ID`` the one started with ``@startuml(id=ID)``. Standard library
+    includes, ``!include <...>``, are left to the server.
+
+    :param include_path: Directories searched for relative targets not
+                    found next to the including file
+    :param mirror: Optional cache of the remote includes, such as a
+                    :class:`plantumlapi.plantumlapi.cache.DiskCache`, keyed
+                    by URL
+    :param httpx.Client client: Client used to download remote includes
+    :param bool offline: Fail instead of downloading includes missing from
+                    the mirror
+    :param float timeout: Timeout of the downloads in seconds
+    """
+    def __init__(self, include_path=(), mirror=None, client: Optional[httpx.Client] = None, offline: bool = False, timeout: float = 10.0) -> None:
+        self.include_path = [os.path.abspath(directory) for directory in include_path]
+        self.mirror = mirror
+        self.client = client
+        self.offline = offline
+        self.timeout = timeout
+
+    def resolve(self, plantuml_text: str, location: Optional[str] = None) -> Resolved:
+        """Inline the includes of a plantuml text.
+
+        :param str plantuml_text: The plantuml markup
+        :param str location: Path or URL of the text, relative targets are
+                    resolved against it. Defaults to the current directory.
+        :returns: a :class:`Resolved` text
+        :raises: PlantUMLError if an include can not be found or is cyclic
+        """
+        if location is None:
+            location = os.path.join(os.getcwd(), '')
+        elif not is_url(location):
+            location = os.path.abspath(location)
+        out, includes = [], {}
+        self._expand(plantuml_text.splitlines(), location, out, includes, {}, [location])
+        return Resolved('\n'.join(out) + ('\n' if plantuml_text.endswith('\n') else ''), list(includes))
+
+    def resolve_file(self, filename: str) -> Resolved:
+        """Read a file and inline its includes."""
+        with open(filename, encoding='utf-8') as f:
+            return self.resolve(f.read(), filename)
+
+    def _expand(self, lines, location: str, out: list, includes: dict, defines: dict, stack: list) -> None:
+        for line in lines:
+            if (match := _DEFINE.match(line)) or (match := _VARIABLE.match(line)):
+                defines[match.group(1)] = match.group(match.lastindex)
+            match = _INCLUDE.match(line)
+            if match is None or match.group(2).startswith('<'):
+                out.append(line)
+                continue
+            directive, target = match.groups()
+            for name, value in defines.items():
+                target = re.sub(rf'(?<![\w$]){re.escape(name)}(?!\w)', lambda _: value, target)
+            selector = None
+            if '!' in target and '/' not in target.rsplit('!', 1)[1]:
+                target, selector = target.rsplit('!', 1)
+            found = self._locate(target, location)
+            if directive == 'include_once' and found in includes:
+                continue
+            if found in stack:
+                raise PlantUMLError(f"Include cycle: {' -> '.join(stack + [found])}")
+            includes.setdefault(found, None)
+            content = self._read(found).splitlines()
+            if directive == 'includesub':
+                if selector is None:
+                    raise PlantUMLError(f"!includesub needs a sub name: {line.strip()}")
+                content = _sub(content, selector)
+            else:
+                content = _block(content, selector)
+            self._expand(content, found, out, includes, defines, stack + [found])
+
+    def _locate(self, target: str, location: str) -> str:
+        """Return the path or URL of an include target."""
+        target = target.strip('"')
+        if is_url(target):
+            return target
+        if is_url(location):
+            return urljoin(location, target)
+        candidates = [target] if os.path.isabs(target) else [os.path.join(os.path.dirname(location), target)] + [os.path.join(directory, target) for directory in self.include_path]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return os.path.normpath(candidate)
+        raise PlantUMLError(f"Included file not found: {target} (from {location})")
+
+    def _read(self, location: str) -> str:
+        if not is_url(location):
+            with open(location, encoding='utf-8') as f:
+                return f.read()
+        if self.mirror is not None and (content := self.mirror.get(location)) is not None:
+            return content.decode('utf-8')
+        if self.offline:
+            raise PlantUMLError(f"Include not in the mirror: {location}")
+        try:
+            if self.client is not None:
+                response = self.client.get(location, timeout=self.timeout)
+            else:
+                response = httpx.get(location, timeout=self.timeout, follow_redirects=True)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise PlantUMLConnectionError(f"Could not download include {location}: {e}") from e
+        if self.mirror is not None:
+            self.mirror.set(location, response.content)
+        return response.text
+
+
+def _block(lines: list, selector: Optional[str]) -> list:
+    """Return the body of the diagram of an included file picked by
+    ``selector``, an index or an id, the first one by default. Files
+    without ``@start`` lines are included whole.
+    """
+    blocks = list(split_diagrams(lines))
+    if not blocks or not START.match(blocks[0].text):
+        if selector is not None:
+            raise PlantUMLError(f"No diagram '{selector}' in an included file without @start lines")
+        return lines
+    for block in blocks:
+        if selector is None or selector == block.name or selector == str(block.index):
+            return block.text.splitlines()[1:-1]
+    raise PlantUMLError(f"No diagram '{selector}' in the included file")
+
+
+def _sub(lines: list, name: str) -> list:
+    """Return the lines between ``!startsub name`` and ``!endsub``."""
+    sub, inside, found = [], False, False
+    for line in lines:
+        if (match := _STARTSUB.match(line)) and match.group(1) == name:
+            inside = found = True
+        elif inside and _ENDSUB.match(line):
+            inside = False
+        elif inside:
+            sub.append(line)
+    if not found:
+        raise PlantUMLError(f"No !startsub {name} in the included file")
+    return sub
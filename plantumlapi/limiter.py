@@ -0,0 +1,129 @@
+"""
+Adaptive concurrency limiting.
+
+A fixed number of workers either leaves a fast server idle or overloads a
+slow one. :class:`AIMDLimiter` instead adjusts how many renders may be in
+flight from the latency and outcome of the ones that completed: additive
+increase while the server keeps up, multiplicative decrease as soon as it
+slows down or fails.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition
+from typing import Optional
+
+from plantumlapi.plantumlapi.errors import PlantUMLTimeoutError
+
+
+class AIMDLimiter:
+    """Additive-increase/multiplicative-decrease concurrency limit.
+
+    Every successful render that was fast enough raises the limit by
+    ``increase / limit``, about ``increase`` per round of renders. An error,
+    or a latency above the threshold, multiplies it by ``decrease``. Renders
+    that started before the last decrease do not decrease it again, so one
+    burst of failures only counts once.
+
+    Without ``latency_threshold`` a render is too slow when it takes more
+    than ``tolerance`` times the :attr:`baseline`, the median latency of the
+    last ``window`` successful renders. A median rides out the jitter of a
+    server, and as a recent one it follows a server that gets slower or
+    faster for good.
+
+    :param int initial_limit: Starting number of renders in flight
+    :param int min_limit: Lowest allowed limit
+    :param int max_limit: Highest allowed limit
+    :param float increase: Additive increase per round of good renders
+    :param float decrease: Multiplicative decrease factor, between 0 and 1
+    :param float latency_threshold: Latency in seconds above which a render
+                    counts as overload
+    :param float tolerance: Multiple of the baseline latency that counts
+                    as overload when ``latency_threshold`` is not set
+    :param int window: Number of recent latencies the baseline is the
+                    median of
+    """
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64, increase: float = 1.0, decrease: float = 0.5, latency_threshold: Optional[float] = None, tolerance: float = 2.0,
+                 window: int = 100) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_threshold = latency_threshold
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._limit = float(initial_limit)
+        self._last_decrease = 0.0
+        self._condition = Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of renders allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def baseline(self) -> Optional[float]:
+        """Median latency of the recent successful renders, ``None`` before
+        the first one.
+        """
+        latencies = sorted(self._latencies)
+        return latencies[len(latencies) // 2] if latencies else None
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """Wait for a free slot.
+
+        :param float timeout: Maximum seconds to wait, forever if ``None``
+        :returns: a token to pass back to :meth:`release`
+        :raises: PlantUMLTimeoutError if no slot freed up in time
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < self.limit, timeout):
+                raise PlantUMLTimeoutError(f"No render slot available within {timeout}s")
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, token: float, success: bool = True, measured: bool = True) -> None:
+        """Free the slot taken by :meth:`acquire` and adjust the limit.
+
+        :param float token: The value returned by :meth:`acquire`
+        :param bool success: Whether the render succeeded. Pass ``True`` for
+                    failures caused by the diagram rather than the server.
+        :param bool measured: Whether the call says anything about the load
+                    of the server. Pass ``False`` for calls that never
+                    reached it, or were rejected for the diagram, to free
+                    the slot without a latency sample or a limit change.
+        """
+        latency = time.monotonic() - token
+        with self._condition:
+            self.in_flight -= 1
+            if not measured:
+                self._condition.notify_all()
+                return
+            threshold = self.latency_threshold
+            if threshold is None and self._latencies:
+                threshold = self.baseline * self.tolerance
+            if success:
+                self._latencies.append(latency)
+            overloaded = not success or (threshold is not None and latency > threshold)
+            if overloaded:
+                if token >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = time.monotonic()
+            else:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Context manager holding a slot. Exiting with an exception counts
+        as a failure.
+        """
+        token = self.acquire(timeout)
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.release(token, success)
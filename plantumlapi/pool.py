@@ -0,0 +1,198 @@
+"""
+Pool of PlantUML servers.
+
+Spreads renders over several servers, ejects the ones that keep failing and
+retries a failed render on another server.
+"""
+
+import time
+from threading import Event, Lock, Thread
+from typing import Optional
+
+import httpx
+
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi.errors import PlantUMLCircuitOpenError, PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.resilience import Deadline, is_server_error
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+
+class _Node:
+    def __init__(self, plantuml: PlantUML) -> None:
+        self.plantuml = plantuml
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class PlantUMLPool:
+    """Load balanced connection to several PlantUML servers.
+
+    Every server gets its own :class:`plantumlapi.plantumlapi.PlantUML`
+    built with the same options. A server that fails ``max_failures`` times
+    in a row, passively during renders or actively during health checks, is
+    ejected for ``eject_seconds``. A render that fails because of the server
+    is retried on the next one; a render rejected because of the diagram
+    (HTTP 4xx) is not.
+
+    :param urls: URLs of the PlantUML servers image CGI
+    :param str strategy: ``'round_robin'`` or ``'least_outstanding'``
+    :param int max_failures: Consecutive failures before a server is ejected
+    :param float eject_seconds: How long an ejected server is skipped
+    :param float health_check_interval: If set, check every server in a
+                    background thread every ``health_check_interval`` seconds.
+    :param options: Extra keyword arguments for each ``PlantUML``. A
+                    ``circuit_breaker`` is cloned so each server gets its own.
+    """
+    def __init__(self, urls, strategy: str = ROUND_ROBIN, max_failures: int = 3, eject_seconds: float = 30.0, health_check_interval: Optional[float] = None, **options) -> None:
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise PlantUMLError(f"Unknown strategy '{strategy}', expected '{ROUND_ROBIN}' or '{LEAST_OUTSTANDING}'")
+        breaker = options.pop('circuit_breaker', None)
+        self.nodes = [_Node(PlantUML(url, circuit_breaker=breaker.clone() if breaker else None, **options)) for url in urls]
+        if not self.nodes:
+            raise PlantUMLError("PlantUMLPool needs at least one server url.")
+        self.strategy = strategy
+        self.post_threshold = self.nodes[0].plantuml.post_threshold
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self._next = 0
+        self._lock = Lock()
+        self._stop = Event()
+        self._health_thread = None
+        if health_check_interval is not None:
+            self.start_health_checks(health_check_interval)
+
+    @property
+    def servers(self):
+        """PlantUML instances of the pool."""
+        return [node.plantuml for node in self.nodes]
+
+    def healthy_servers(self):
+        """PlantUML instances that are not currently ejected."""
+        now = time.monotonic()
+        return [node.plantuml for node in self.nodes if node.healthy(now)]
+
+    def get_url(self, plantuml_text: str, format: Optional[str] = None):
+        """Return the image URL on the next server.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format
+        :returns: the plantuml server image URL
+        """
+        return self._candidates()[0].plantuml.get_url(plantuml_text, format)
+
+    def process(self, plantuml_text: str, format: Optional[str] = None, deadline=None, encoded: Optional[str] = None):
+        """Processes the plantuml text on the next server, retrying on the
+        other servers if it fails.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str format: Output format
+        :param deadline: Optional time budget for the render, all servers
+                    included, in seconds or as a :class:`Deadline`.
+        :param str encoded: The text already deflated and encoded
+        :returns: the raw image data and the image URL
+        :raises: PlantUMLHTTPError from the last server tried
+        """
+        deadline = Deadline.of(deadline)
+        error = None
+        for node in self._candidates():
+            with self._lock:
+                node.outstanding += 1
+            try:
+                result = node.plantuml.process(plantuml_text, format, deadline, encoded)
+            except PlantUMLCircuitOpenError as e:
+                error = e
+                continue
+            except PlantUMLHTTPError as e:
+                if not is_server_error(e):
+                    self._succeeded(node)
+                    raise
+                self._failed(node)
+                error = e
+                continue
+            finally:
+                with self._lock:
+                    node.outstanding -= 1
+            self._succeeded(node)
+            return result
+        raise error
+
+    # The batch helpers of PlantUML only rely on process and get_url.
+    process_many = PlantUML.process_many
+    iter_completed = PlantUML.iter_completed
+    _process_or_error = PlantUML._process_or_error
+
+    def check_health(self):
+        """Actively check every server, ejecting the ones that are down and
+        bringing back the ones that recovered.
+
+        :returns: dict mapping each server URL to ``True`` if it is healthy
+        """
+        results = {}
+        for node in self.nodes:
+            try:
+                response = node.plantuml.client.get(f'{node.plantuml.server}/')
+                healthy = response.status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            if healthy:
+                self._succeeded(node)
+            else:
+                self._failed(node)
+            results[node.plantuml.url] = healthy
+        return results
+
+    def start_health_checks(self, interval: float):
+        """Run :meth:`check_health` every ``interval`` seconds in a daemon thread."""
+        def run():
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._stop.clear()
+        self._health_thread = Thread(target=run, name='plantuml-pool-health', daemon=True)
+        self._health_thread.start()
+
+    def close(self):
+        """Stop the health checks and close every server connection."""
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+            self._health_thread = None
+        for node in self.nodes:
+            node.plantuml.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _candidates(self):
+        """Return the nodes in the order they should be tried: healthy ones
+        first according to the strategy, ejected ones last.
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.nodes)
+            ordered = self.nodes[start:] + self.nodes[:start]
+            if self.strategy == LEAST_OUTSTANDING:
+                # stable sort, ties keep the round robin order
+                ordered.sort(key=lambda node: node.outstanding)
+        return [node for node in ordered if node.healthy(now)] + [node for node in ordered if not node.healthy(now)]
+
+    def _succeeded(self, node: _Node):
+        with self._lock:
+            node.failures = 0
+            node.ejected_until = 0.0
+
+    def _failed(self, node: _Node):
+        with self._lock:
+            node.failures += 1
+            if node.failures >= self.max_failures:
+                node.ejected_until = time.monotonic() + self.eject_seconds
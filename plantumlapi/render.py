@@ -0,0 +1,214 @@
+"""
+Incremental rendering of a directory of PlantUML files.
+
+:func:`render_tree` renders every diagram of a source tree into an output
+tree and records the hash of each source in a manifest stored next to the
+images. The next run only renders the sources that were added or changed
+since, and removes the images of the deleted ones. With an
+:class:`plantumlapi.plantumlapi.include.IncludeResolver` the includes are
+inlined and hashed with the source, and recorded in the manifest.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from hashlib import sha256
+from tempfile import mkstemp
+from typing import NamedTuple, Optional
+
+from plantumlapi.plantumlapi.encoding import FORMATS
+from plantumlapi.plantumlapi.errors import PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.include import is_url
+
+MANIFEST_NAME = '.pyplantuml-manifest.json'
+MANIFEST_VERSION = 1
+SOURCE_PATTERNS = ('*.puml', '*.plantuml', '*.pu', '*.wsd')
+
+
+class RenderReport(NamedTuple):
+    """Outcome of :func:`render_tree`, as source paths relative to the
+    source directory.
+    """
+    rendered: list
+    unchanged: list
+    removed: list
+    failed: dict
+
+
+class Manifest:
+    """Hashes of the rendered sources of an output directory.
+
+    ``entries`` maps the path of each source, relative to the source
+    directory, to the ``hash`` of its content, the ``output`` image path,
+    relative to the output directory, and the ``includes`` it depends on,
+    as paths relative to the source directory or URLs.
+
+    :param str filename: Where the manifest is stored
+    :param str server: PlantUML server the images were rendered with
+    :param str format: Output format of the images
+    :param dict entries: The rendered sources
+    """
+    def __init__(self, filename: str, server: Optional[str] = None, format: Optional[str] = None, entries: Optional[dict] = None) -> None:
+        self.filename = filename
+        self.server = server
+        self.format = format
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, filename: str) -> 'Manifest':
+        """Read a manifest, returning an empty one if it is missing,
+        unreadable or from another version.
+        """
+        try:
+            with open(filename, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(filename)
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            return cls(filename)
+        return cls(filename, data.get('server'), data.get('format'), data.get('entries', {}))
+
+    def dependents(self, path: str):
+        """Return the sources that include ``path``, a path relative to the
+        source directory or a URL.
+        """
+        return [source for source, entry in self.entries.items() if path in entry.get('includes', ())]
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                json.dump({'version': MANIFEST_VERSION, 'server': self.server, 'format': self.format, 'entries': self.entries}, out, indent=1, sort_keys=True)
+            os.replace(tmp, self.filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def find_sources(directory: str, patterns=SOURCE_PATTERNS):
+    """Return the PlantUML sources under ``directory``, as sorted paths
+    relative to it using ``/`` separators.
+    """
+    sources = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            if any(fnmatch(name, pattern) for pattern in patterns):
+                sources.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(sources)
+
+
+def source_hash(filename: str) -> str:
+    """Return the sha256 hex digest of a file's content."""
+    digest = sha256()
+    with open(filename, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_source(source_dir: str, source: str, resolver=None):
+    """Read a source and return its text, hash and includes.
+
+    :param str source_dir: The source directory
+    :param str source: Path of the source relative to ``source_dir``
+    :param resolver: Optional :class:`IncludeResolver` inlining the includes
+    :returns: the text to render, its sha256 hex digest and the list of
+              files it includes, relative to ``source_dir``, or URLs
+    """
+    filename = os.path.join(source_dir, source)
+    if resolver is None:
+        with open(filename, encoding='utf-8') as f:
+            plantuml_text = f.read()
+        return plantuml_text, source_hash(filename), []
+    resolved = resolver.resolve_file(filename)
+    includes = [location if is_url(location) else os.path.relpath(location, source_dir).replace(os.sep, '/') for location in resolved.includes]
+    return resolved.text, sha256(resolved.text.encode('utf-8')).hexdigest(), includes
+
+
+def output_path(source: str, format: str) -> str:
+    """Return the image path of a source path for ``format``."""
+    return os.path.splitext(source)[0] + FORMATS.get(format, f'.{format}')
+
+
+def render_tree(plantuml, source_dir: str, out_dir: Optional[str] = None, format: Optional[str] = None, max_workers: int = 8, force: bool = False, patterns=SOURCE_PATTERNS, resolver=None) -> RenderReport:
+    """Render the PlantUML sources of a directory, incrementally.
+
+    A source is rendered when it is new, its content changed, its image is
+    missing, or the server or format changed since the last run. The
+    images of deleted sources are removed. Failed sources are left out of
+    the manifest so they are retried on the next run.
+
+    With a ``resolver`` the includes of each source are inlined before it
+    is hashed and rendered, so a change to an included file re-renders
+    exactly the sources that include it.
+
+    :param plantuml: The PlantUML client used to render
+    :param str source_dir: Directory searched recursively for sources
+    :param str out_dir: Directory the images are written to, mirroring the
+                    source tree. Defaults to ``source_dir``.
+    :param str format: Output format, defaults to the one of the client,
+                    or png
+    :param int max_workers: Number of renders in flight
+    :param bool force: Render every source even if unchanged
+    :param patterns: File name patterns of the sources
+    :param resolver: Optional :class:`IncludeResolver`
+    :returns: a :class:`RenderReport`
+    """
+    out_dir = out_dir or source_dir
+    format = format or plantuml.format or 'png'
+    manifest = Manifest.load(os.path.join(out_dir, MANIFEST_NAME))
+    previous = manifest.entries
+    reuse = not force and manifest.server == plantuml.server and manifest.format == format
+    manifest.server, manifest.format, manifest.entries = plantuml.server, format, {}
+
+    sources = find_sources(source_dir, patterns)
+    report = RenderReport([], [], [], {})
+    pending = []
+    for source in sources:
+        output = output_path(source, format)
+        try:
+            plantuml_text, digest, includes = load_source(source_dir, source, resolver)
+        except (PlantUMLError, OSError, UnicodeDecodeError) as e:
+            report.failed[source] = e
+            continue
+        entry = previous.get(source)
+        if reuse and entry is not None and entry['hash'] == digest and entry['output'] == output and os.path.exists(os.path.join(out_dir, output)):
+            manifest.entries[source] = entry
+            report.unchanged.append(source)
+        else:
+            pending.append((source, plantuml_text, digest, includes, output))
+
+    current = {output for *_, output in pending} | {entry['output'] for entry in manifest.entries.values()} | {output_path(source, format) for source in report.failed}
+    for source, entry in previous.items():
+        if entry['output'] not in current:
+            try:
+                os.remove(os.path.join(out_dir, entry['output']))
+            except FileNotFoundError:
+                pass
+            if source not in manifest.entries and source not in sources:
+                report.removed.append(source)
+
+    def render(plantuml_text: str, output: str):
+        outfile = os.path.join(out_dir, output)
+        os.makedirs(os.path.dirname(outfile), exist_ok=True)
+        plantuml.download(plantuml_text, outfile, format)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(executor.submit(render, plantuml_text, output), source, digest, includes, output) for source, plantuml_text, digest, includes, output in pending]
+            for future, source, digest, includes, output in futures:
+                try:
+                    future.result()
+                except (PlantUMLError, PlantUMLHTTPError, OSError) as e:
+                    report.failed[source] = e
+                else:
+                    manifest.entries[source] = {'hash': digest, 'output': output, 'includes': includes}
+                    report.rendered.append(source)
+    finally:
+        manifest.save()
+    return report
@@ -0,0 +1,176 @@
+"""
+Retries, deadlines and circuit breaking for PlantUML renders.
+
+Renders are idempotent, so a render that failed because of the server or
+the connection can safely be sent again. :class:`RetryPolicy` decides when
+and how long to wait, :class:`Deadline` bounds the total time spent on a
+call or a batch, and :class:`CircuitBreaker` stops sending requests to a
+server whose error rate is too high.
+"""
+
+import random
+import time
+from collections import deque
+from threading import Lock
+from typing import Optional, Union
+
+import httpx
+
+from plantumlapi.plantumlapi.errors import PlantUMLCircuitOpenError, PlantUMLHTTPError, PlantUMLTimeoutError
+
+
+def is_server_error(error: PlantUMLHTTPError) -> bool:
+    """Return ``True`` if the error comes from the server or the connection
+    rather than from the diagram itself (a 4xx answer).
+    """
+    cause = error.response
+    if isinstance(cause, httpx.HTTPStatusError):
+        return cause.response.status_code >= 500
+    return True
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed render.
+
+    Connection errors and the ``retry_statuses`` answers are retried with
+    exponential backoff and full jitter: the n-th retry waits a random time
+    between 0 and ``min(max_backoff, backoff * 2 ** (n - 1))`` seconds.
+
+    :param int max_attempts: Total number of attempts, including the first
+    :param float backoff: Base delay in seconds
+    :param float max_backoff: Maximum delay in seconds
+    :param bool jitter: Randomize the delays to spread out retries
+    :param retry_statuses: HTTP status codes worth retrying
+    """
+    def __init__(self, max_attempts: int = 3, backoff: float = 0.1, max_backoff: float = 5.0, jitter: bool = True, retry_statuses=(429, 500, 502, 503, 504)) -> None:
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def is_retryable(self, error: PlantUMLHTTPError) -> bool:
+        """Return ``True`` if the failed render may succeed if sent again."""
+        cause = error.response
+        if isinstance(cause, httpx.HTTPStatusError):
+            return cause.response.status_code in self.retry_statuses
+        return isinstance(cause, httpx.TransportError)
+
+    def delay(self, attempt: int) -> float:
+        """Return the delay before the retry following ``attempt`` (1-based)."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class Deadline:
+    """A point in time by which a call, or a whole batch, must be done.
+
+    :param float seconds: Time budget from now
+    """
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    @classmethod
+    def of(cls, deadline: Union['Deadline', float, None]) -> Optional['Deadline']:
+        """Return ``deadline`` as a :class:`Deadline`, accepting seconds."""
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def check(self) -> float:
+        """Return the seconds left.
+
+        :raises: PlantUMLTimeoutError if the deadline has passed
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise PlantUMLTimeoutError(f"Deadline of {self.seconds}s exceeded")
+        return remaining
+
+
+class CircuitBreaker:
+    """Fail fast once a server's error rate crosses a threshold.
+
+    The breaker looks at the outcome of the last ``window`` calls. Once at
+    least ``min_calls`` of them are known and the share of failures reaches
+    ``failure_threshold`` it opens: calls fail immediately with
+    :class:`PlantUMLCircuitOpenError` for ``reset_timeout`` seconds. It then
+    lets a single trial call through (half open) and closes again if that
+    call succeeds.
+
+    :param float failure_threshold: Failure rate, between 0 and 1, that opens the circuit
+    :param int window: Number of recent calls considered
+    :param int min_calls: Calls needed before the rate is trusted
+    :param float reset_timeout: Seconds the circuit stays open
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20, min_calls: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = Lock()
+
+    def clone(self) -> 'CircuitBreaker':
+        """Return a new closed breaker with the same settings."""
+        return CircuitBreaker(self.failure_threshold, self.window, self.min_calls, self.reset_timeout)
+
+    def before_call(self) -> None:
+        """Reserve a call.
+
+        :raises: PlantUMLCircuitOpenError if the circuit is open
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise PlantUMLCircuitOpenError("Circuit open, the server is failing")
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    raise PlantUMLCircuitOpenError("Circuit half open, waiting for the trial call")
+                self._trial = True
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of a call reserved with :meth:`before_call`."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._outcomes.clear()
+                if success:
+                    self.state = self.CLOSED
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a call reserved with :meth:`before_call` without an
+        outcome, as when it failed for a reason unrelated to the server. A
+        half open circuit then lets the next call through as its trial.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial = False
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
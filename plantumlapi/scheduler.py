@@ -0,0 +1,186 @@
+"""
+Priority scheduling of renders.
+
+Separates user facing renders from bulk ones sharing the same client, so a
+large background job can not starve interactive previews.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from typing import Optional
+
+from plantumlapi.plantumlapi.errors import PlantUMLError
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+
+class _Job:
+    __slots__ = ('plantuml_text', 'format', 'future', 'queued_at')
+
+    def __init__(self, plantuml_text: str, format: Optional[str]) -> None:
+        self.plantuml_text = plantuml_text
+        self.format = format
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class _PriorityClass:
+    def __init__(self, name: str, weight: int, samples: int) -> None:
+        self.name = name
+        self.weight = weight
+        self.current = 0
+        self.queue = deque()
+        self.submitted = 0
+        self.completed = 0
+        self.waits = deque(maxlen=samples)
+
+
+class RenderScheduler:
+    """Run renders of a PlantUML client on worker threads, by priority class.
+
+    Each class has its own queue. ``reserved`` workers only ever serve their
+    class, so it always has capacity; the other workers serve every class
+    with smooth weighted round robin, so a class with weight 4 gets four
+    renders for each render of a class with weight 1 while both have work
+    queued, and all the capacity when it is the only one.
+
+    :param plantuml: The PlantUML (or PlantUMLPool) used to render
+    :param int workers: Total number of worker threads
+    :param dict weights: Weight of each priority class
+    :param dict reserved: Number of workers dedicated to a class
+    :param int samples: Number of recent wait times kept per class for
+                    the metrics
+    """
+    def __init__(self, plantuml, workers: int = 8, weights: Optional[dict] = None, reserved: Optional[dict] = None, samples: int = 1000) -> None:
+        if weights is None:
+            weights = {INTERACTIVE: 4, BACKGROUND: 1}
+        if reserved is None:
+            reserved = {INTERACTIVE: 1}
+        unknown = [name for name in reserved if name not in weights]
+        if unknown:
+            raise PlantUMLError(f"Unknown reserved priority class '{unknown[0]}', expected one of {', '.join(weights)}")
+        if sum(reserved.values()) >= workers:
+            raise PlantUMLError("The reserved workers must leave at least one shared worker.")
+        self.plantuml = plantuml
+        self.classes = {name: _PriorityClass(name, weight, samples) for name, weight in weights.items()}
+        self._condition = Condition()
+        self._closed = False
+        self._threads = []
+        dedicated = [name for name, count in reserved.items() for _ in range(count)]
+        for index in range(workers):
+            only = dedicated[index] if index < len(dedicated) else None
+            thread = Thread(target=self._work, args=(only,), name=f'plantuml-render-{only or "shared"}-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, plantuml_text: str, priority: str = INTERACTIVE, format: Optional[str] = None) -> Future:
+        """Queue a render.
+
+        :param str plantuml_text: The plantuml markup to render
+        :param str priority: The priority class
+        :param str format: Output format
+        :returns: a Future resolving to ``(content, url)``
+        """
+        if priority not in self.classes:
+            raise PlantUMLError(f"Unknown priority class '{priority}', expected one of {', '.join(self.classes)}")
+        job = _Job(plantuml_text, format)
+        with self._condition:
+            if self._closed:
+                raise PlantUMLError("The scheduler is closed.")
+            priority_class = self.classes[priority]
+            priority_class.queue.append(job)
+            priority_class.submitted += 1
+            self._condition.notify_all()
+        return job.future
+
+    def process(self, plantuml_text: str, priority: str = INTERACTIVE, format: Optional[str] = None):
+        """Render through the scheduler and wait for the result.
+
+        :returns: the raw image data and the image URL
+        """
+        return self.submit(plantuml_text, priority, format).result()
+
+    def stats(self) -> dict:
+        """Queue depth and wait time metrics of each priority class.
+
+        :returns: dict mapping each class to its ``queued``, ``submitted``
+                  and ``completed`` counts and the ``wait_avg``, ``wait_p99``
+                  and ``wait_max`` of its recent jobs, in seconds
+        """
+        with self._condition:
+            stats = {}
+            for name, priority_class in self.classes.items():
+                waits = sorted(priority_class.waits)
+                stats[name] = {
+                    'queued': len(priority_class.queue),
+                    'submitted': priority_class.submitted,
+                    'completed': priority_class.completed,
+                    'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+                    'wait_p99': waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+                    'wait_max': waits[-1] if waits else 0.0,
+                }
+            return stats
+
+    def close(self, wait: bool = True) -> None:
+        """Stop accepting renders. Queued renders still run.
+
+        :param bool wait: Wait for the queued renders to finish
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_job(self, only: Optional[str]):
+        """Pop the next job for a worker, waiting for one. Must be called
+        with the condition held. Returns ``None`` once closed and drained.
+        """
+        while True:
+            if only is not None:
+                candidates = [self.classes[only]] if self.classes[only].queue else []
+            else:
+                candidates = [priority_class for priority_class in self.classes.values() if priority_class.queue]
+            if candidates:
+                break
+            if self._closed:
+                return None
+            self._condition.wait()
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            # smooth weighted round robin between the classes with work
+            total = 0
+            for priority_class in candidates:
+                priority_class.current += priority_class.weight
+                total += priority_class.weight
+            chosen = max(candidates, key=lambda priority_class: priority_class.current)
+            chosen.current -= total
+        job = chosen.queue.popleft()
+        chosen.waits.append(time.monotonic() - job.queued_at)
+        return chosen, job
+
+    def _work(self, only: Optional[str]) -> None:
+        while True:
+            with self._condition:
+                next_job = self._next_job(only)
+            if next_job is None:
+                return
+            priority_class, job = next_job
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(self.plantuml.process(job.plantuml_text, job.format))
+                except BaseException as e:
+                    job.future.set_exception(e)
+            with self._condition:
+                priority_class.completed += 1
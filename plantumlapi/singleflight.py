@@ -0,0 +1,110 @@
+"""
+In-flight request coalescing.
+
+When several callers ask for the same render at the same time only the
+first one, the leader, sends the request; the others wait for it and get
+the same result or exception.
+"""
+
+import asyncio
+from threading import Event, Lock
+from typing import Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key across threads."""
+    def __init__(self) -> None:
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key: Hashable, fn: Callable):
+        """Call ``fn()`` unless a call with the same ``key`` is already in
+        flight, in which case wait for it and share its outcome.
+
+        :param key: Identifies identical calls
+        :param fn: The call to make
+        :returns: the result of ``fn()``
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class _AsyncCall:
+    def __init__(self) -> None:
+        self.task = None
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """Coalesce concurrent coroutine calls with the same key on one event loop.
+
+    The shared call runs in a task of its own. A caller that is cancelled,
+    the first one included, only stops waiting for it; the call itself is
+    cancelled once no caller is left waiting.
+    """
+    def __init__(self) -> None:
+        self._calls = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Await ``fn()`` unless a call with the same ``key`` is already in
+        flight, in which case wait for it and share its outcome.
+
+        :param key: Identifies identical calls
+        :param fn: Coroutine function making the call
+        :returns: the result of ``fn()``
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _AsyncCall()
+
+            async def run():
+                try:
+                    return await fn()
+                finally:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+
+            call.task = asyncio.ensure_future(run())
+            # retrieve the error even when every caller stopped waiting
+            call.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # new callers must start a fresh call, not join this one
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,166 @@
+"""
+Split files holding several diagrams.
+
+A PlantUML file may hold several ``@startuml ... @enduml`` blocks, and a
+block several pages separated by ``newpage``. :func:`split_diagrams` reads
+the lines of such a file lazily and yields each diagram on its own, so a
+large file is never held in memory whole.
+
+Servers crop images larger than their ``PUML_LIMIT_SIZE``, 8192 pixels for
+the one started by ``pyplantuml start-server``. :func:`paginate` estimates
+the height of sequence diagrams and breaks the long ones into pages that
+fit, which :func:`split_diagrams` then renders separately.
+"""
+
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+# PUML_LIMIT_SIZE of the server started by pyplantuml start-server, in pixels
+LIMIT_SIZE = 8192
+# estimated height of a message row and of the title and participant boxes
+ROW_HEIGHT = 30
+HEADER_HEIGHT = 120
+
+START = re.compile(r'^\s*@start(\w+)(?:\s*\(\s*id\s*=\s*(\w+)\s*\)|\s+(\S+))?')
+END = re.compile(r'^\s*@end\w+')
+NEWPAGE = re.compile(r'^\s*newpage\b')
+# lines of the first page repeated on the others when splitting pages
+_SETUP = re.compile(r'^\s*(?:!|skinparam\b|hide\b|show\b|scale\b|participant\b|actor\b|boundary\b|control\b|entity\b|database\b|collections\b|queue\b)[^{]*$')
+_MESSAGE = re.compile(r'^\s*\S.*?\s*(?:<<?-+|-+>>?|<<?\.+|\.+>>?)')
+# lines of blocks that are not sequence diagrams, whose pages can not be broken
+_NOT_SEQUENCE = re.compile(r'^\s*(?:(?:class|interface|enum|abstract|annotation|usecase|state|component|node|package|object|rectangle|start|stop)\b|:|\(|\[(?![-o<x]))')
+_GROUP = re.compile(r'^\s*(?:(?:alt|opt|loop|par|break|critical|group|box)\b|ref\s+over\b[^:]*$|[rh]?note\b[^:]*$)')
+_GROUP_END = re.compile(r'^\s*end(?:\s*(?:box|ref|[rh]?note))?\s*$')
+
+
+class Diagram(NamedTuple):
+    """A diagram of a file.
+
+    ``index`` counts the blocks of the file from 0, ``page`` the pages of
+    the block from 0 (always 0 unless pages are split). ``start`` and
+    ``end`` are the 1-based line numbers of its first and last line in the
+    file, ``text`` its plantuml markup, including the ``@start`` and
+    ``@end`` lines.
+    """
+    index: int
+    page: int
+    name: Optional[str]
+    start: int
+    end: int
+    text: str
+
+
+def split_diagrams(lines: Iterable[str], pages: bool = False) -> Iterator[Diagram]:
+    """Yield the diagrams of a file, one block, or page, at a time.
+
+    Lines outside of ``@start``/``@end`` blocks are ignored, except in a
+    file without any ``@start`` line which is one diagram as a whole.
+
+    :param lines: The lines of the file, such as an open text file
+    :param bool pages: Also split the blocks at ``newpage`` lines. Each
+                    page is then a diagram of its own, repeating the
+                    ``@start`` line and the single line setup directives
+                    (``skinparam``, ``!``, ``hide``, ``show``, ``scale``)
+                    of the first page.
+    :returns: generator of :class:`Diagram`
+    """
+    index = 0
+    body = header = footer = name = None
+    setup, outside, page, first = [], [], 0, 0
+    number = 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if body is None:
+            if match := START.match(line):
+                header, footer, name = line, f'@end{match.group(1)}', match.group(2) or match.group(3)
+                body, setup, page, first, outside = [line], [], 0, number, None
+            elif outside is not None:
+                outside.append(line)
+            continue
+        if END.match(line):
+            body.append(line)
+            yield Diagram(index, page, name, first, number, '\n'.join(body) + '\n')
+            index += 1
+            body = None
+        elif pages and NEWPAGE.match(line):
+            yield Diagram(index, page, name, first, number - 1, '\n'.join(body + [footer]) + '\n')
+            page += 1
+            body, first = [header] + setup, number + 1
+        else:
+            body.append(line)
+            if pages and page == 0 and _SETUP.match(line):
+                setup.append(line)
+    if body is not None:
+        # unterminated, let the server report it
+        yield Diagram(index, page, name, first, number, '\n'.join(body) + '\n')
+    elif outside and any(line.strip() for line in outside):
+        yield Diagram(0, 0, None, 1, number, '\n'.join(outside) + '\n')
+
+
+def estimate_height(lines: Iterable[str]) -> int:
+    """Estimate the height in pixels of a sequence diagram from the lines
+    of its body: a row per message, note line or separator.
+    """
+    return _height(sum(map(_rows, lines)))
+
+
+def _rows(line: str) -> int:
+    """Return the number of rows a line adds to a sequence diagram."""
+    if not line.strip() or line.lstrip().startswith("'") or START.match(line) or END.match(line) or _SETUP.match(line) or NEWPAGE.match(line):
+        return 0
+    return line.count('\\n') + 1
+
+
+def _height(rows: int) -> int:
+    return HEADER_HEIGHT + rows * ROW_HEIGHT
+
+
+def paginate(lines: Iterable[str], limit: int = LIMIT_SIZE) -> Iterator[str]:
+    """Insert ``newpage`` lines into the sequence diagrams of a file so no
+    page is estimated taller than ``limit`` pixels, see
+    :func:`estimate_height`.
+
+    Pages are only broken between top level rows, never inside a group,
+    box or note. Other diagrams are passed through unchanged. The file is
+    read lazily, one block at a time.
+
+    :param lines: The lines of the file, such as an open text file
+    :param int limit: Height budget of a page in pixels, the
+                    ``PUML_LIMIT_SIZE`` of the server
+    :returns: generator of the lines, without line endings
+    """
+    block = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if block is None:
+            if START.match(line) and START.match(line).group(1) == 'uml':
+                block = [line]
+            else:
+                yield line
+            continue
+        block.append(line)
+        if END.match(line):
+            yield from _paginate_block(block, limit)
+            block = None
+    if block is not None:
+        yield from _paginate_block(block, limit)
+
+
+def _paginate_block(block: list, limit: int) -> Iterator[str]:
+    if any(_NOT_SEQUENCE.match(line) for line in block[1:]) or not any(_MESSAGE.match(line) for line in block[1:]):
+        yield from block
+        return
+    rows = depth = 0
+    for line in block:
+        added = _rows(line)
+        if NEWPAGE.match(line):
+            rows = 0
+        elif depth == 0 and rows and _height(rows + added) > limit and (_MESSAGE.match(line) or _GROUP.match(line)):
+            yield 'newpage'
+            rows = 0
+        if _GROUP_END.match(line):
+            depth = max(0, depth - 1)
+        elif _GROUP.match(line):
+            depth += 1
+        rows += added
+        yield line
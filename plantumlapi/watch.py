@@ -0,0 +1,266 @@
+"""
+Watch a directory of PlantUML files and re-render them as they change.
+
+:class:`TreeWatcher` keeps the output tree of
+:func:`plantumlapi.plantumlapi.render.render_tree` up to date. Changes are
+picked up from filesystem events when the optional ``watchdog`` package is
+installed (inotify on Linux), by polling modification times otherwise.
+With an include resolver, a change to an included file re-renders the
+sources that include it.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from tempfile import mkstemp
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+
+from plantumlapi.plantumlapi.errors import PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.include import is_url
+from plantumlapi.plantumlapi.render import MANIFEST_NAME, SOURCE_PATTERNS, Manifest, find_sources, load_source, output_path, render_tree
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    Observer = None
+
+
+class TreeWatcher:
+    """Re-render the PlantUML sources of a directory when they change.
+
+    A burst of saves to the same file is coalesced into one render issued
+    once the file has been quiet for ``debounce`` seconds. A change to a
+    file whose render is queued or in flight makes that render stale: a
+    queued render is cancelled, the result of a running one is discarded,
+    so an older version never overwrites a newer image.
+
+    :param plantuml: The PlantUML client used to render
+    :param str source_dir: Directory searched recursively for sources
+    :param str out_dir: Directory the images are written to, defaults to
+                    ``source_dir``
+    :param str format: Output format, defaults to the one of the client,
+                    or png
+    :param float interval: Seconds between two scans when polling
+    :param float debounce: Seconds a file must stay unchanged before it is
+                    rendered
+    :param int max_workers: Number of renders in flight
+    :param on_render: Called with ``(source, error)`` after each render or
+                    removal, ``error`` being ``None`` on success
+    :param bool use_watchdog: Use filesystem events, defaults to ``True``
+                    when ``watchdog`` is installed
+    :param patterns: File name patterns of the sources
+    :param resolver: Optional
+                    :class:`plantumlapi.plantumlapi.include.IncludeResolver`
+    """
+    def __init__(self, plantuml, source_dir: str, out_dir: Optional[str] = None, format: Optional[str] = None, interval: float = 0.25, debounce: float = 0.1, max_workers: int = 4,
+                 on_render: Optional[Callable] = None, use_watchdog: Optional[bool] = None, patterns=SOURCE_PATTERNS, resolver=None) -> None:
+        if use_watchdog and Observer is None:
+            raise PlantUMLError("use_watchdog requires the watchdog package.")
+        self.plantuml = plantuml
+        self.source_dir = source_dir
+        self.out_dir = out_dir or source_dir
+        self.format = format or plantuml.format or 'png'
+        self.interval = interval
+        self.debounce = debounce
+        self.max_workers = max_workers
+        self.on_render = on_render
+        self.use_watchdog = Observer is not None if use_watchdog is None else use_watchdog
+        self.patterns = patterns
+        self.resolver = resolver
+        self._changed = {}
+        self._generations = {}
+        self._futures = {}
+        self._snapshot = {}
+        self._manifest = None
+        self._lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+        self._thread = None
+
+    def run(self) -> None:
+        """Bring the output tree up to date, then watch until :meth:`stop`."""
+        self._stop.clear()
+        manifest = os.path.join(self.out_dir, MANIFEST_NAME)
+        # scan before the first render so the changes made during it are seen
+        self._manifest = Manifest.load(manifest)
+        before = self._scan()
+        report = render_tree(self.plantuml, self.source_dir, self.out_dir, self.format, self.max_workers, patterns=self.patterns, resolver=self.resolver)
+        for source, error in report.failed.items():
+            self._notify(source, error)
+        self._manifest = Manifest.load(manifest)
+        self._snapshot = {**self._scan(), **before}
+        observer = self._start_observer() if self.use_watchdog else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while not self._stop.is_set():
+                    if observer is None:
+                        self._poll()
+                    timeout = self._dispatch(executor)
+                    self._wake.wait(timeout)
+                    self._wake.clear()
+                with self._lock:
+                    for future in self._futures.values():
+                        future.cancel()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def start(self) -> 'TreeWatcher':
+        """Run the watcher in a daemon thread."""
+        self._thread = Thread(target=self.run, name='plantuml-watch', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop watching. Renders in flight are finished, queued ones dropped.
+
+        :param bool wait: Wait for the watcher thread to exit
+        """
+        self._stop.set()
+        self._wake.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def changed(self, source: str) -> None:
+        """Mark a source, relative to ``source_dir``, as changed.
+
+        Its pending or running render becomes stale and a new one is
+        scheduled once the file stays quiet for ``debounce`` seconds.
+        """
+        with self._lock:
+            self._changed[source] = time.monotonic()
+            self._generations[source] = self._generations.get(source, 0) + 1
+            future = self._futures.pop(source, None)
+        if future is not None:
+            future.cancel()
+        self._wake.set()
+
+    def path_changed(self, path: str) -> None:
+        """Mark a file, relative to ``source_dir``, as changed: the file
+        itself if it is a source, and the sources that include it.
+        """
+        if any(fnmatch(os.path.basename(path), pattern) for pattern in self.patterns) and not path.startswith('../'):
+            self.changed(path)
+        with self._lock:
+            dependents = self._manifest.dependents(path)
+        for source in dependents:
+            self.changed(source)
+
+    def _scan(self) -> dict:
+        with self._lock:
+            includes = {path for entry in self._manifest.entries.values() for path in entry.get('includes', ()) if not is_url(path)}
+        snapshot = {}
+        for path in includes.union(find_sources(self.source_dir, self.patterns)):
+            try:
+                stat = os.stat(os.path.join(self.source_dir, path))
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _poll(self) -> None:
+        snapshot = self._scan()
+        for path in snapshot.keys() | self._snapshot.keys():
+            if snapshot.get(path) != self._snapshot.get(path):
+                self.path_changed(path)
+        self._snapshot = snapshot
+
+    def _dispatch(self, executor) -> float:
+        """Submit the renders of the sources that are quiet, returning how
+        long to wait before the next check.
+        """
+        now = time.monotonic()
+        timeout = self.interval
+        with self._lock:
+            for source, changed_at in list(self._changed.items()):
+                wait = changed_at + self.debounce - now
+                if wait > 0:
+                    timeout = min(timeout, wait)
+                    continue
+                del self._changed[source]
+                self._futures[source] = executor.submit(self._render, source, self._generations[source])
+        return timeout
+
+    def _render(self, source: str, generation: int) -> None:
+        filename = os.path.join(self.source_dir, source)
+        output = output_path(source, self.format)
+        outfile = os.path.join(self.out_dir, output)
+        if not os.path.exists(filename):
+            with self._lock:
+                if self._generations.get(source) != generation:
+                    return
+                self._manifest.entries.pop(source, None)
+                self._manifest.save()
+                self._futures.pop(source, None)
+            try:
+                os.remove(outfile)
+            except FileNotFoundError:
+                pass
+            self._notify(source, None)
+            return
+        error = includes = None
+        try:
+            plantuml_text, digest, includes = load_source(self.source_dir, source, self.resolver)
+            entry = self._manifest.entries.get(source)
+            if entry is not None and entry['hash'] == digest and os.path.exists(outfile):
+                return
+            content, _ = self.plantuml.process(plantuml_text, self.format)
+        except (PlantUMLError, PlantUMLHTTPError, OSError, UnicodeDecodeError) as e:
+            error = e
+        with self._lock:
+            if self._generations.get(source) != generation:
+                return
+            self._futures.pop(source, None)
+            if error is None:
+                _write_atomic(outfile, content)
+                self._manifest.entries[source] = {'hash': digest, 'output': output, 'includes': includes}
+            elif includes is None:
+                self._manifest.entries.pop(source, None)
+            else:
+                # keep the includes, so fixing an included file retries the render
+                self._manifest.entries[source] = {'hash': None, 'output': output, 'includes': includes}
+            self._manifest.save()
+        self._notify(source, error)
+
+    def _notify(self, source: str, error) -> None:
+        if self.on_render is not None:
+            self.on_render(source, error)
+
+    def _start_observer(self):
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for filename in (event.src_path, getattr(event, 'dest_path', None)):
+                    if filename:
+                        watcher.path_changed(os.path.relpath(filename, watcher.source_dir).replace(os.sep, '/'))
+
+        observer = Observer()
+        observer.schedule(Handler(), self.source_dir, recursive=True)
+        observer.start()
+        return observer
+
+
+def _write_atomic(filename: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    fd, tmp = mkstemp(dir=os.path.dirname(os.path.abspath(filename)), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(content)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,14 @@
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUML
+
+@pytest.fixture
+def mock_plantuml():
+    """Factory of clients whose requests are answered by ``handler(request)``
+    instead of a server. ``client`` may be AsyncPlantUML or PlantUMLPool,
+    with a list of urls, as well.
+    """
+    def make(handler, url="http://plantuml/img", client=PlantUML, **kwargs):
+        return client(url, http_opts={"transport": httpx.MockTransport(handler)}, **kwargs)
+
+    return make
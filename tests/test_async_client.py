@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+import pytest
+from plantumlapi.plantumlapi import AsyncPlantUML, PlantUMLHTTPError
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_process(mock_plantuml):
+    def handler(request):
+        return httpx.Response(200, content=b"PNG" + request.url.path.encode())
+
+    async def main():
+        async with mock_plantuml(handler, client=AsyncPlantUML) as plantuml:
+            return await plantuml.process("@startuml\nactor Bob\n@enduml")
+
+    content, url = run(main())
+    assert url.startswith("http://plantuml/img/")
+    assert content.startswith(b"PNG/img/")
+
+def test_max_concurrency(mock_plantuml):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, content=b"PNG")
+
+    async def main():
+        async with mock_plantuml(handler, client=AsyncPlantUML, max_concurrency=3) as plantuml:
+            return await asyncio.gather(*(plantuml.process(f"@startuml\nactor Bob{i}\n@enduml") for i in range(20)))
+
+    assert len(run(main())) == 20
+    assert peak == 3
+
+def test_http_error(mock_plantuml):
+    async def main():
+        async with mock_plantuml(lambda request: httpx.Response(400, content=b"syntax error"), client=AsyncPlantUML) as plantuml:
+            await plantuml.process("@startuml\nincorrect input\n@enduml")
+
+    with pytest.raises(PlantUMLHTTPError):
+        run(main())
+
+def test_form_auth_login_once(mock_plantuml):
+    logins = []
+
+    def handler(request):
+        if request.url.path == "/login":
+            logins.append(request.content)
+            return httpx.Response(200, headers={"Set-Cookie": "session=1"})
+        assert request.headers["cookie"] == "session=1"
+        return httpx.Response(200, content=b"PNG")
+
+    async def main():
+        async with mock_plantuml(
+            handler,
+            client=AsyncPlantUML,
+            form_auth={"url": "http://plantuml/login", "body": {"username": "me", "password": "secret"}},
+        ) as plantuml:
+            await asyncio.gather(*(plantuml.process("@startuml\nactor Bob\n@enduml") for _ in range(5)))
+
+    run(main())
+    assert len(logins) == 1
+
+def test_process_large_diagram_uses_post(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"PNG")
+
+    async def main():
+        async with mock_plantuml(handler, client=AsyncPlantUML, post_threshold=64) as plantuml:
+            await plantuml.process("@startuml\n" + "Bob -> Alice : hello\n" * 10 + "@enduml")
+
+    run(main())
+    assert requests[0].method == "POST"
@@ -0,0 +1,75 @@
+import os
+import httpx
+from plantumlapi.plantumlapi.cache import DiskCache, RenderCache
+
+def test_lru_eviction_by_entries():
+    cache = RenderCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3")
+    assert "b" not in cache
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.stats == {"hits": 2, "misses": 1, "evictions": 1, "entries": 2, "bytes": 2}
+
+def test_lru_eviction_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.set("a", b"x" * 6)
+    cache.set("b", b"x" * 6)
+    assert "a" not in cache and "b" in cache
+    cache.set("c", b"x" * 11)
+    assert "c" not in cache
+    assert cache.size == 6
+
+def test_process_uses_cache(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"PNG")
+
+    cache = RenderCache()
+    plantuml = mock_plantuml(handler, cache=cache)
+    first = plantuml.process("@startuml\nactor Bob\n@enduml")
+    second = plantuml.process("@startuml\nactor Bob\n@enduml")
+    assert first == second
+    assert len(requests) == 1
+    assert cache.stats["hits"] == 1
+    key = plantuml.cache_key(plantuml.deflate_and_encode("@startuml\nactor Bob\n@enduml"))
+    assert key[:2] == ("http://plantuml", "img")
+
+def test_disk_cache(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"))
+    assert cache.get(("server", "png", "abc")) is None
+    cache.set(("server", "png", "abc"), b"PNG")
+    assert cache.get(("server", "png", "abc")) == b"PNG"
+    assert DiskCache(str(tmp_path / "cache")).get(("server", "png", "abc")) == b"PNG"
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+    assert not [name for name in os.listdir(tmp_path / "cache") if name.startswith(".tmp-")]
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    for i, key in enumerate("abc"):
+        cache.set(key, b"x" * 10)
+        os.utime(cache.path(key), (i, i))
+    assert "a" not in cache
+    os.utime(cache.path("b"), (10, 10))
+    cache.set("d", b"x" * 10)
+    assert "c" not in cache and "b" in cache and "d" in cache
+
+def test_process_file_uses_disk_cache(tmp_path, mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"PNG")
+
+    source = tmp_path / "diagram.puml"
+    source.write_text("@startuml\nactor Bob\n@enduml")
+    cache = DiskCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        plantuml = mock_plantuml(handler, cache=cache)
+        assert plantuml.process_file(str(source), outfile="diagram.png", directory=str(tmp_path))
+    assert (tmp_path / "diagram.png").read_bytes() == b"PNG"
+    assert len(requests) == 1
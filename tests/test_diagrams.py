@@ -0,0 +1,119 @@
+import io
+import httpx
+from plantumlapi.plantumlapi.cache import RenderCache
+from plantumlapi.plantumlapi.diagrams import ClassDiagram, DataFlow, EdgeList, ERD, GanttDiagram, JSONDiagram, Message, MindMap, NetworkDiagram, Relationship, SequenceDiagram, Task, Usecase
+from plantumlapi.plantumlapi.encoding import iter_chunks
+
+def test_sequence_draw_and_write_to():
+    diagram = SequenceDiagram("Login", [("Bob", "Alice", "hello"), ("Alice", "Web Server", "GET /", "-->"), "note left: raw line"])
+    lines = list(diagram.draw())
+    assert lines == ["@startuml", "title Login", "Bob -> Alice : hello", 'Alice --> "Web Server" : GET /', "note left: raw line", "@enduml"]
+    out = io.StringIO()
+    diagram.write_to(out, chunk_size=8)
+    assert out.getvalue() == diagram.text() == "\n".join(lines) + "\n"
+
+def test_other_diagrams_draw():
+    classes = ClassDiagram("Model", {})
+    user = ClassDiagram.Class("User", {"name": "str"}, {})
+    user.add_method("rename", {"name": "str"}, "None")
+    classes.add_class(user)
+    assert list(classes.body()) == ["class User {", "  name : str", "  rename(name : str) : None", "}"]
+    assert list(MindMap("Plan", ["root", "a", "b", "c"], [("root", "a"), ("a", "b"), ("root", "c")]).body()) == ["* root", "** a", "*** b", "** c"]
+    assert list(GanttDiagram("Plan", [("Design", 3), ("Build", 5, "Design")]).draw())[0] == "@startgantt"
+    assert list(ERD("Db", [("User", {"id": "int"})], [("User", "Order", "places", "||--o{")]).body())[-1] == "User ||--o{ Order : places"
+    assert list(JSONDiagram("Data", {"a": [1]}).draw()) == ["@startjson", "{", '  "a": [', "    1", "  ]", "}", "@endjson"]
+
+def test_records_and_edge_list():
+    diagram = SequenceDiagram("Chat", [("Bob", "Alice", "hi")], participants=[("Bob", "actor")])
+    diagram.add_step(Message("".join(["Al", "ice"]), "Bob", "hello", "-->"))
+    assert isinstance(diagram.steps[0], Message)
+    assert diagram.steps[1].source is diagram.steps[0].target
+    assert list(diagram.body()) == ["actor Bob", "Bob -> Alice : hi", "Alice --> Bob : hello"]
+
+    network = NetworkDiagram("Net", ["a"], [("a", "b"), ("b", "c", "uplink")])
+    network.add_edge(("c", "a"))
+    assert network.nodes == ["a", "b", "c"]
+    assert list(network.edges) == [("a", "b"), ("b", "c", "uplink"), ("c", "a")]
+    assert network.edges[1] == ("b", "c", "uplink") and network.edges[-1] == ("c", "a")
+    assert list(network.edges.sources) == [0, 1, 2] and list(network.edges.targets) == [1, 2, 0]
+    assert list(network.body())[-2:] == ["b -- c : uplink", "c -- a"]
+    assert len(EdgeList(edges=[("x", "y")] * 3)) == 3
+    assert list(MindMap("m", ["a"], [("a", "b", "x")]).body()) == ["* a", "** b"]
+
+    erd = ERD("Db", ["User"], [("User", "Order", "places", "||--o{")])
+    erd.add_relationship(("Order", "Item"))
+    assert all(isinstance(relationship, Relationship) for relationship in erd.relationships)
+    assert list(erd.body())[-2:] == ["User ||--o{ Order : places", "Order -- Item"]
+    usecase = Usecase("Shop", ["Bob"], ["Buy"], [("Bob", "(Buy)", "uses")])
+    flows = DataFlow("Flow", ["Pay"], ["Db"], [("(Pay)", "Db")])
+    assert isinstance(usecase.relationships, EdgeList) and isinstance(flows.dataflows, EdgeList)
+    assert list(usecase.body())[-1] == 'Bob --> "(Buy)" : uses' and list(flows.body())[-1] == '"(Pay)" --> Db'
+
+def test_iter_chunks():
+    lines = [f"line {i}" for i in range(1000)]
+    chunks = list(iter_chunks(lines, chunk_size=100))
+    assert len(chunks) > 1 and "".join(chunks) == "\n".join(lines) + "\n"
+
+def test_export_get_and_streamed_post(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append((request.method, request.url, request.read()))
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler, url="http://plantuml/png", post_threshold=1024)
+    small = SequenceDiagram("Small", [("A", "B", "hi")])
+    assert small.export("svg", plantuml) == b"PNG"
+    assert str(requests[0][1]) == plantuml.get_url(small.text(), "svg")
+
+    large = SequenceDiagram("Large", [("A", "B", f"message {i}") for i in range(1000)])
+    assert large.export("png", plantuml) == b"PNG"
+    method, url, body = requests[1]
+    assert method == "POST" and str(url) == "http://plantuml/png" and body == large.text().encode()
+
+def test_unchanged_diagram_is_not_rendered_again(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler, url="http://plantuml/png", cache=RenderCache(), post_threshold=1024)
+    diagram = SequenceDiagram("Memo", [("A", "B", "hi")])
+    url = diagram.get_url(plantuml)
+    assert diagram.export("png", plantuml) == diagram.export("png", plantuml) == b"PNG"
+    assert len(requests) == 1 and str(requests[0]) == url == plantuml.get_url(diagram.text())
+    assert diagram.text() is diagram.text()
+
+    diagram.add_step(("B", "A", "hello"))
+    assert diagram.get_url(plantuml) != url
+    diagram.export("png", plantuml)
+    assert len(requests) == 2
+
+    classes = ClassDiagram("Model", {"User": ClassDiagram.Class("User", {}, {})})
+    digest = classes.digest()
+    classes.classes["User"].add_attribute("name", "str")
+    assert classes.digest() != digest
+
+    large = SequenceDiagram("Large", [("A", "B", f"message {i}") for i in range(1000)])
+    large.export("png", plantuml)
+    large.export("png", plantuml)
+    assert len(requests) == 3
+
+def test_pages(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler, url="http://plantuml/png")
+    sequence = SequenceDiagram("Long", [("A", "B", f"m{i}") for i in range(20)])
+    assert len(sequence.pages(limit=400)) == 3 and sequence.pages() == [sequence.text()]
+    assert sequence.export_pages("png", plantuml, limit=400) == [b"PNG"] * 3 and len(requests) == 3
+
+    gantt = GanttDiagram("Plan", [("Design", 3)] + [Task(f"T{i}", 2, "Design" if i == 0 else f"T{i - 1}") for i in range(20)])
+    pages = gantt.pages(limit=400)
+    assert len(pages) == 2 and pages[0].startswith("@startgantt\ntitle Plan (1/2)\n[Design] lasts 3 days\n")
+    assert "[T13] lasts 2 days\n[T13] starts D+29\n[T14] lasts 2 days\n[T14] starts at [T13]'s end\n" in pages[1]
+    assert gantt.pages() == [gantt.text()]
@@ -0,0 +1,65 @@
+import random
+import pytest
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi.encoding import decode_and_inflate, deflate_and_encode, encode, encode_many, parse_url, text_from_url
+from plantumlapi.plantumlapi.errors import PlantUMLError
+
+@pytest.fixture
+def plantuml():
+    return PlantUML(url="http://www.plantuml.com/plantuml/img/")
+
+def legacy_encode(plantuml, data):
+    res = ""
+    for i in range(0, len(data), 3):
+        if i + 2 == len(data):
+            res += plantuml._encode3bytes(data[i], data[i + 1], 0)
+        elif i + 1 == len(data):
+            res += plantuml._encode3bytes(data[i], 0, 0)
+        else:
+            res += plantuml._encode3bytes(data[i], data[i + 1], data[i + 2])
+    return res
+
+def test_encode_matches_legacy(plantuml):
+    rng = random.Random(1234)
+    for size in list(range(0, 64)) + [rng.randrange(64, 20000) for _ in range(50)]:
+        data = bytes(rng.getrandbits(8) for _ in range(size))
+        assert encode(data) == legacy_encode(plantuml, data)
+        assert plantuml.encode(data) == legacy_encode(plantuml, data)
+
+def test_deflate_and_encode_known_value(plantuml):
+    plantuml_text = "@startuml\nBob -> Alice : hello\n@enduml"
+    assert deflate_and_encode(plantuml_text) == plantuml.deflate_and_encode(plantuml_text)
+    assert plantuml.deflate_and_encode("Bob -> Alice : hello") == "SyfFKj2rKt3CoKnELR1Io4ZDoSa70000"
+
+def test_decode_and_inflate_round_trip(plantuml):
+    plantuml_text = "@startuml\nBob -> Alice : héllo\n" + "A -> B\n" * 500 + "@enduml"
+    assert decode_and_inflate(deflate_and_encode(plantuml_text)) == plantuml_text
+    assert plantuml.decode_and_inflate(plantuml.get_url(plantuml_text)) == plantuml_text
+
+def test_decode_prefixes():
+    assert decode_and_inflate("~1SyfFKj2rKt3CoKnELR1Io4ZDoSa70000") == "Bob -> Alice : hello"
+    assert decode_and_inflate("~h" + "Bob -> Alice".encode().hex()) == "Bob -> Alice"
+
+def test_decode_invalid():
+    with pytest.raises(PlantUMLError):
+        decode_and_inflate("S")
+    with pytest.raises(PlantUMLError):
+        decode_and_inflate("not*valid")
+
+def test_parse_url():
+    parsed = parse_url("http://www.plantuml.com/plantuml/svg/SyfFKj2rKt3CoKnELR1Io4ZDoSa70000")
+    assert parsed == ("http://www.plantuml.com/plantuml", "svg", "SyfFKj2rKt3CoKnELR1Io4ZDoSa70000")
+    assert text_from_url("http://localhost:8080/png/SyfFKj2rKt3CoKnELR1Io4ZDoSa70000") == "Bob -> Alice : hello"
+    with pytest.raises(PlantUMLError):
+        parse_url("http://localhost:8080/")
+
+def test_encode_many():
+    plantuml_texts = [f"Bob -> Alice : hello {i}" for i in range(50)]
+    expected = [deflate_and_encode(plantuml_text) for plantuml_text in plantuml_texts]
+    assert list(encode_many(iter(plantuml_texts), processes=2, chunksize=8)) == expected
+    assert list(encode_many(plantuml_texts, processes=1)) == expected
+    assert list(encode_many(["A -> B", "A -> B" * 100], processes=1, max_size=100)) == [deflate_and_encode("A -> B"), None]
+
+def test_get_urls(plantuml):
+    plantuml_texts = ["Bob -> Alice : hello", "A -> B"]
+    assert list(plantuml.get_urls(plantuml_texts, format='svg', processes=2)) == [plantuml.get_url(plantuml_text, 'svg') for plantuml_text in plantuml_texts]
@@ -0,0 +1,68 @@
+import os
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUMLError
+from plantumlapi.plantumlapi.cache import RenderCache
+from plantumlapi.plantumlapi.include import IncludeResolver
+from plantumlapi.plantumlapi.render import render_tree
+
+def write(filename, text):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def test_resolve_local_includes(tmp_path):
+    write(str(tmp_path / "shared" / "style.iuml"), "@startuml\nskinparam shadowing false\n@enduml\n")
+    write(str(tmp_path / "shared" / "macros.iuml"), "!startsub ACTORS\nactor Bob\n!endsub\nactor Unused\n")
+    write(str(tmp_path / "shared" / "many.iuml"), "@startuml\nfirst\n@enduml\n@startuml(id=SECOND)\nsecond\n@enduml\n")
+    write(str(tmp_path / "src" / "a.puml"), "@startuml\n!include ../shared/style.iuml\n!include_once style.iuml\n!includesub macros.iuml!ACTORS\n!include many.iuml!SECOND\n!include <C4/C4_Container>\nBob -> Alice\n@enduml\n")
+    resolver = IncludeResolver(include_path=[str(tmp_path / "shared")])
+    resolved = resolver.resolve_file(str(tmp_path / "src" / "a.puml"))
+    assert resolved.text == "@startuml\nskinparam shadowing false\nactor Bob\nsecond\n!include <C4/C4_Container>\nBob -> Alice\n@enduml\n"
+    assert resolved.includes == [str(tmp_path / "shared" / name) for name in ("style.iuml", "macros.iuml", "many.iuml")]
+
+def test_resolve_errors(tmp_path):
+    write(str(tmp_path / "a.iuml"), "!include b.iuml")
+    write(str(tmp_path / "b.iuml"), "!include a.iuml")
+    resolver = IncludeResolver()
+    with pytest.raises(PlantUMLError, match="cycle"):
+        resolver.resolve_file(str(tmp_path / "a.iuml"))
+    with pytest.raises(PlantUMLError, match="not found"):
+        resolver.resolve("!include missing.iuml", str(tmp_path / "c.puml"))
+
+def test_resolve_urls_from_mirror():
+    requests = []
+
+    def handler(request):
+        requests.append(str(request.url))
+        if request.url.path.endswith("AWSCommon.puml"):
+            return httpx.Response(200, text="!include General/Users.puml\nhide stereotype")
+        return httpx.Response(200, text="sprite $Users [1x1/16] {\n0\n}")
+
+    mirror = RenderCache()
+    resolver = IncludeResolver(mirror=mirror, client=httpx.Client(transport=httpx.MockTransport(handler)))
+    plantuml_text = "!define AWSPuml https://icons.example.com/dist\n!include AWSPuml/AWSCommon.puml\n"
+    resolved = resolver.resolve(plantuml_text)
+    assert "hide stereotype" in resolved.text and "sprite $Users" in resolved.text
+    assert resolved.includes == ["https://icons.example.com/dist/AWSCommon.puml", "https://icons.example.com/dist/General/Users.puml"]
+    assert IncludeResolver(mirror=mirror, offline=True).resolve(plantuml_text) == resolved
+    assert len(requests) == 2
+
+def test_render_tree_rerenders_dependents(tmp_path, mock_plantuml):
+    src = str(tmp_path)
+    write(os.path.join(src, "shared", "style.iuml"), "skinparam shadowing false")
+    write(os.path.join(src, "a.puml"), "!include shared/style.iuml\nA -> B")
+    write(os.path.join(src, "b.puml"), "B -> C")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"<svg/>")
+
+    plantuml = mock_plantuml(handler, url="http://plantuml/svg")
+    resolver = IncludeResolver()
+    assert sorted(render_tree(plantuml, src, resolver=resolver).rendered) == ["a.puml", "b.puml"]
+    write(os.path.join(src, "shared", "style.iuml"), "skinparam shadowing true")
+    report = render_tree(plantuml, src, resolver=resolver)
+    assert report.rendered == ["a.puml"] and report.unchanged == ["b.puml"]
+    assert len(requests) == 3
@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUMLCircuitOpenError, PlantUMLHTTPError, PlantUMLTimeoutError
+from plantumlapi.plantumlapi.limiter import AIMDLimiter
+from plantumlapi.plantumlapi.resilience import CircuitBreaker
+
+def test_additive_increase():
+    limiter = AIMDLimiter(initial_limit=2, max_limit=4, latency_threshold=1)
+    for _ in range(20):
+        limiter.release(limiter.acquire())
+    assert limiter.limit == 4
+
+def test_multiplicative_decrease_once_per_burst():
+    limiter = AIMDLimiter(initial_limit=8, latency_threshold=1)
+    tokens = [limiter.acquire() for _ in range(4)]
+    for token in tokens:
+        limiter.release(token, success=False)
+    assert limiter.limit == 4
+    limiter.release(limiter.acquire(), success=False)
+    assert limiter.limit == 2
+
+def test_slow_renders_decrease():
+    limiter = AIMDLimiter(initial_limit=8, latency_threshold=0.01)
+    with limiter.slot():
+        time.sleep(0.02)
+    assert limiter.limit == 4
+
+def test_acquire_blocks_at_limit():
+    limiter = AIMDLimiter(initial_limit=1)
+    token = limiter.acquire()
+    with pytest.raises(PlantUMLTimeoutError):
+        limiter.acquire(timeout=0.01)
+    threading.Timer(0.02, limiter.release, args=(token,)).start()
+    limiter.release(limiter.acquire(timeout=1))
+    assert limiter.in_flight == 0
+
+def test_process_uses_limiter(mock_plantuml):
+    peak = 0
+    in_flight = 0
+    lock = threading.Lock()
+
+    def handler(request):
+        nonlocal peak, in_flight
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return httpx.Response(200, content=b"PNG")
+
+    limiter = AIMDLimiter(initial_limit=2, max_limit=3, latency_threshold=1)
+    plantuml = mock_plantuml(handler, limiter=limiter)
+    plantuml.process_many([f"@startuml\nactor Bob{i}\n@enduml" for i in range(20)], max_workers=8)
+    assert peak <= 3
+    assert limiter.in_flight == 0
+
+def test_limiter_ignores_calls_that_say_nothing_of_the_load(mock_plantuml):
+    statuses = [503, 503, 400] + [200] * 20
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status == 200:
+            time.sleep(0.02)
+        return httpx.Response(status, content=b"PNG")
+
+    limiter = AIMDLimiter(initial_limit=4)
+    breaker = CircuitBreaker(window=2, min_calls=2, reset_timeout=0.05)
+    plantuml = mock_plantuml(handler, limiter=limiter, circuit_breaker=breaker)
+    text = "@startuml\nactor Bob\n@enduml"
+    for _ in range(2):
+        with pytest.raises(PlantUMLHTTPError):
+            plantuml.process(text)
+    for _ in range(3):
+        with pytest.raises(PlantUMLCircuitOpenError):
+            plantuml.process(text)
+    assert limiter.limit == 1 and limiter.in_flight == 0
+    time.sleep(0.06)
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.process(text)
+    for _ in range(20):
+        plantuml.process(text)
+    assert limiter.baseline >= 0.02
+    assert limiter.limit >= 4
+
+def test_default_threshold_rides_out_jitter(mock_plantuml):
+    jitter = random.Random(0)
+
+    def handler(request):
+        time.sleep(jitter.uniform(0.005, 0.015))
+        return httpx.Response(200, content=b"PNG")
+
+    limiter = AIMDLimiter(initial_limit=4, max_limit=16)
+    plantuml = mock_plantuml(handler, limiter=limiter)
+    plantuml.process_many([f"@startuml\nactor Bob{i}\n@enduml" for i in range(300)], max_workers=16)
+    assert 0.005 <= limiter.baseline <= 0.05
+    assert limiter.limit >= 8
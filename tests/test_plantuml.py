@@ -1,6 +1,10 @@
+import io
 import pytest
 import os
-from plantumlapi.plantumlapi import PlantUML
+import httpx
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from plantumlapi.plantumlapi import PlantUML, PlantUMLError, PlantUMLHTTPError
 
 @pytest.fixture
 def plantuml():
@@ -52,3 +56,147 @@ def test_processes_file(plantuml):
     os.remove(outfile)
     os.remove(errorfile)
 
+
+def test_process_many_ordered(mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, content=request.url.path.encode()))
+    texts = [f"@startuml\nactor Bob{i}\n@enduml" for i in range(50)]
+    results = plantuml.process_many(texts, max_workers=4)
+    assert [url for _, url in results] == [plantuml.get_url(text) for text in texts]
+    assert all(url.endswith(content.decode().rsplit("/", 1)[-1]) for content, url in results)
+
+def test_process_many_encode_processes(mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, content=request.method.encode()), post_threshold=1024)
+    texts = [f"@startuml\nactor Bob{i}\n@enduml" for i in range(20)] + ["@startuml\n" + "A -> B\n" * 500 + "@enduml"]
+    results = plantuml.process_many(texts, max_workers=4, encode_processes=2)
+    assert [url for _, url in results[:-1]] == [plantuml.get_url(text) for text in texts[:-1]]
+    assert [content for content, _ in results] == [b"GET"] * 20 + [b"POST"]
+
+def test_iter_completed_errors_do_not_abort(mock_plantuml):
+    broken = PlantUML(url="http://plantuml/img").get_url("@startuml\nbroken\n@enduml").rsplit("/", 1)[-1]
+
+    def handler(request):
+        if request.url.path.endswith(broken):
+            return httpx.Response(400, content=b"syntax error")
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler)
+    texts = iter(["@startuml\nactor Bob\n@enduml", "@startuml\nbroken\n@enduml", "@startuml\nactor Alice\n@enduml"])
+    results = {index: (content, url) for index, content, url in plantuml.iter_completed(texts, max_workers=2)}
+    assert sorted(results) == [0, 1, 2]
+    assert results[0][0] == results[2][0] == b"PNG"
+    assert isinstance(results[1][0], PlantUMLHTTPError)
+    assert results[1][1].endswith(broken)
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.process_many(["@startuml\nbroken\n@enduml"], return_exceptions=False)
+
+def test_process_large_diagram_uses_post(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler, post_threshold=1024)
+    small = "@startuml\nactor Bob\n@enduml"
+    large = "@startuml\n" + "Bob -> Alice : hello\n" * 100 + "@enduml"
+    _, small_url = plantuml.process(small)
+    _, large_url = plantuml.process(large)
+    assert [request.method for request in requests] == ["GET", "POST"]
+    assert small_url == plantuml.get_url(small)
+    assert large_url == "http://plantuml/img"
+    assert requests[1].content == large.encode("utf-8")
+
+def test_formats(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=request.url.path.split("/")[1].encode())
+
+    plantuml = mock_plantuml(handler)
+    plantuml_text = "@startuml\nactor Bob\n@enduml"
+    encoded = plantuml.deflate_and_encode(plantuml_text)
+    assert (plantuml.server, plantuml.format) == ("http://plantuml", "img")
+    assert plantuml.get_url(plantuml_text) == f"http://plantuml/img/{encoded}"
+    assert plantuml.get_url(plantuml_text, format="svg") == f"http://plantuml/svg/{encoded}"
+    assert plantuml.process(plantuml_text, format="txt")[0] == b"txt"
+    results = plantuml.process_formats(plantuml_text, ["svg", "png", "pdf"])
+    assert {output_format: content for output_format, (content, _) in results.items()} == {"svg": b"svg", "png": b"png", "pdf": b"pdf"}
+    assert results["pdf"][1] == f"http://plantuml/pdf/{encoded}"
+    with pytest.raises(PlantUMLError):
+        plantuml.get_url(plantuml_text, format="gif")
+
+def test_process_file_format(tmp_path, mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, content=b"<svg/>"))
+    source = tmp_path / "diagram.puml"
+    source.write_text("@startuml\nactor Bob\n@enduml")
+    assert plantuml.process_file(str(source), format="svg")
+    assert (tmp_path / "diagram.svg").read_bytes() == b"<svg/>"
+
+def test_render_to_and_download(tmp_path, mock_plantuml):
+    image = os.urandom(300 * 1024)
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, content=image))
+    buffer = io.BytesIO()
+    url = plantuml.render_to("@startuml\nactor Bob\n@enduml", buffer, chunk_size=4096)
+    assert buffer.getvalue() == image
+    assert url == plantuml.get_url("@startuml\nactor Bob\n@enduml")
+    outfile = tmp_path / "diagram.png"
+    plantuml.download("@startuml\nactor Bob\n@enduml", str(outfile))
+    assert outfile.read_bytes() == image
+    assert os.listdir(tmp_path) == ["diagram.png"]
+
+def test_download_error_leaves_no_file(tmp_path, mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(400, content=b"syntax error"))
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.download("@startuml\nincorrect input\n@enduml", str(tmp_path / "diagram.png"))
+    assert os.listdir(tmp_path) == []
+
+def test_connection_options():
+    with PlantUML(url="http://plantuml/img", max_connections=32, max_keepalive_connections=16, keepalive_expiry=60, timeout=3) as plantuml:
+        pool = plantuml.client._transport._pool
+        assert (pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry) == (32, 16, 60)
+        assert plantuml.client.timeout == httpx.Timeout(3)
+
+def test_shared_client():
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"PNG")))
+    with PlantUML(url="http://plantuml/svg", client=client) as svg, PlantUML(url="http://plantuml/png", client=client) as png:
+        assert svg.client is png.client
+        assert svg.process("@startuml\nactor Bob\n@enduml")[0] == b"PNG"
+    assert not client.is_closed
+
+def test_warmup(mock_plantuml):
+    hits = []
+
+    def handler(request):
+        hits.append(request.url.path)
+        return httpx.Response(200)
+
+    assert mock_plantuml(handler).warmup(connections=3) == 3
+    assert hits == ["/"] * 3
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ports = set()
+
+    def do_GET(self):
+        KeepAliveHandler.ports.add(self.client_address[1])
+        self.send_response(200)
+        self.send_header("Content-Length", "3")
+        self.end_headers()
+        self.wfile.write(b"PNG")
+
+    def log_message(self, *args):
+        pass
+
+def test_warmup_pools_the_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with PlantUML(url=f"http://127.0.0.1:{server.server_address[1]}/png") as plantuml:
+            assert plantuml.warmup(connections=3) == 3
+            assert len(plantuml.client._transport._pool.connections) == 3
+            plantuml.process("@startuml\nA -> B\n@enduml")
+            assert len(KeepAliveHandler.ports) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
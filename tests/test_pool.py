@@ -0,0 +1,65 @@
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUMLHTTPError
+from plantumlapi.plantumlapi.pool import PlantUMLPool
+
+def make_pool(mock_plantuml, handler, urls=("http://a/img", "http://b/img", "http://c/img"), **kwargs):
+    return mock_plantuml(handler, list(urls), client=PlantUMLPool, **kwargs)
+
+def test_round_robin(mock_plantuml):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(200, content=b"PNG")
+
+    with make_pool(mock_plantuml, handler) as pool:
+        for _ in range(6):
+            pool.process("@startuml\nactor Bob\n@enduml")
+    assert hosts == ["a", "b", "c", "a", "b", "c"]
+
+def test_failover_and_ejection(mock_plantuml):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        if request.url.host == "a":
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200, content=b"PNG")
+
+    with make_pool(mock_plantuml, handler, max_failures=1) as pool:
+        content, url = pool.process("@startuml\nactor Bob\n@enduml")
+        assert content == b"PNG" and url.startswith("http://b/img/")
+        assert [server.url for server in pool.healthy_servers()] == ["http://b/img", "http://c/img"]
+        for _ in range(4):
+            pool.process("@startuml\nactor Bob\n@enduml")
+    assert hosts.count("a") == 1
+
+def test_diagram_errors_are_not_retried(mock_plantuml):
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(400, content=b"syntax error")
+
+    with make_pool(mock_plantuml, handler) as pool:
+        with pytest.raises(PlantUMLHTTPError):
+            pool.process("@startuml\nincorrect input\n@enduml")
+        assert len(pool.healthy_servers()) == 3
+    assert hosts == ["a"]
+
+def test_check_health_and_batch(mock_plantuml):
+    down = {"b"}
+
+    def handler(request):
+        if request.url.host in down:
+            return httpx.Response(503)
+        return httpx.Response(200, content=request.url.host.encode())
+
+    with make_pool(mock_plantuml, handler, max_failures=1) as pool:
+        assert pool.check_health() == {"http://a/img": True, "http://b/img": False, "http://c/img": True}
+        results = pool.process_many([f"@startuml\nactor Bob{i}\n@enduml" for i in range(10)], max_workers=3)
+        assert {content for content, _ in results} == {b"a", b"c"}
+        down.clear()
+        pool.check_health()
+        assert len(pool.healthy_servers()) == 3
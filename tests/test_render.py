@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import httpx
+from typer.testing import CliRunner
+from plantumlapi.plantumlapi import PlantUML
+from plantumlapi.plantumlapi import cli
+from plantumlapi.plantumlapi.render import MANIFEST_NAME, Manifest, render_tree
+
+def svg_plantuml(mock_plantuml, requests, url="http://plantuml/svg"):
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith(broken):
+            return httpx.Response(400, content=b"syntax error")
+        return httpx.Response(200, content=b"<svg/>")
+
+    broken = PlantUML(url).get_url("broken").rsplit("/", 1)[-1]
+    return mock_plantuml(handler, url=url)
+
+def write(filename, text):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def test_render_tree_is_incremental(tmp_path, mock_plantuml):
+    src, out = str(tmp_path / "src"), str(tmp_path / "out")
+    write(os.path.join(src, "a.puml"), "A -> B")
+    write(os.path.join(src, "sub", "b.puml"), "B -> C")
+    write(os.path.join(src, "notes.txt"), "not a diagram")
+    requests = []
+    plantuml = svg_plantuml(mock_plantuml, requests)
+
+    report = render_tree(plantuml, src, out)
+    assert sorted(report.rendered) == ["a.puml", "sub/b.puml"]
+    assert os.path.exists(os.path.join(out, "sub", "b.svg"))
+    assert len(requests) == 2
+
+    report = render_tree(plantuml, src, out)
+    assert report.rendered == [] and sorted(report.unchanged) == ["a.puml", "sub/b.puml"]
+    assert len(requests) == 2
+
+    write(os.path.join(src, "a.puml"), "A -> C")
+    os.remove(os.path.join(src, "sub", "b.puml"))
+    report = render_tree(plantuml, src, out)
+    assert report.rendered == ["a.puml"] and report.removed == ["sub/b.puml"]
+    assert not os.path.exists(os.path.join(out, "sub", "b.svg"))
+    assert len(requests) == 3
+
+def test_render_tree_format_change_and_failures(tmp_path, mock_plantuml):
+    src = str(tmp_path)
+    write(os.path.join(src, "a.puml"), "A -> B")
+    write(os.path.join(src, "bad.puml"), "broken")
+    plantuml = svg_plantuml(mock_plantuml, [])
+
+    report = render_tree(plantuml, src)
+    assert report.rendered == ["a.puml"] and list(report.failed) == ["bad.puml"]
+    assert list(Manifest.load(os.path.join(src, MANIFEST_NAME)).entries) == ["a.puml"]
+
+    report = render_tree(plantuml, src, format="png")
+    assert report.rendered == ["a.puml"]
+    assert os.path.exists(os.path.join(src, "a.png")) and not os.path.exists(os.path.join(src, "a.svg"))
+
+def test_cli_render(tmp_path, monkeypatch, mock_plantuml):
+    write(str(tmp_path / "a.puml"), "A -> B")
+    monkeypatch.setattr(cli, "PlantUML", lambda url, **kwargs: svg_plantuml(mock_plantuml, [], url))
+    result = CliRunner().invoke(cli.app, ["render", str(tmp_path), "--out", str(tmp_path / "out"), "--url", "http://plantuml/png"])
+    assert result.exit_code == 0, result.output
+    assert "1 rendered" in result.output
+    assert os.path.exists(tmp_path / "out" / "a.png")
+
+def test_cli_module_runs(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(cli.__file__))))
+    env = {**os.environ, "PYTHONPATH": root}
+    command = [sys.executable, "-m", "plantumlapi.plantumlapi.cli"]
+    result = subprocess.run(command + ["render", "--help"], env=env, capture_output=True, text=True)
+    assert result.returncode == 0 and "--out" in result.stdout
+    result = subprocess.run(command + ["render", str(tmp_path), "--out", str(tmp_path / "out"), "--url", "http://127.0.0.1:9/png"], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,94 @@
+import time
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUMLCircuitOpenError, PlantUMLHTTPError, PlantUMLTimeoutError
+from plantumlapi.plantumlapi.resilience import CircuitBreaker, Deadline, RetryPolicy
+
+def flaky(statuses):
+    statuses = list(statuses)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = statuses.pop(0) if statuses else 200
+        if status is None:
+            raise httpx.ConnectError("connection reset")
+        return httpx.Response(status, content=b"PNG")
+
+    return handler, calls
+
+def test_retry_transient_errors(mock_plantuml):
+    handler, calls = flaky([503, None])
+    plantuml = mock_plantuml(handler, retry=RetryPolicy(max_attempts=3, backoff=0.001))
+    assert plantuml.process("@startuml\nactor Bob\n@enduml")[0] == b"PNG"
+    assert len(calls) == 3
+
+def test_no_retry_on_diagram_error(mock_plantuml):
+    handler, calls = flaky([400])
+    plantuml = mock_plantuml(handler, retry=RetryPolicy(max_attempts=3, backoff=0.001))
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.process("@startuml\nincorrect input\n@enduml")
+    assert len(calls) == 1
+
+def test_retry_delays():
+    policy = RetryPolicy(backoff=1, max_backoff=3, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+    assert 0 <= RetryPolicy(backoff=1).delay(3) <= 4
+
+def test_deadline():
+    deadline = Deadline(0.05)
+    assert Deadline.of(deadline) is deadline and Deadline.of(None) is None
+    assert 0 < deadline.check() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired()
+    with pytest.raises(PlantUMLTimeoutError):
+        deadline.check()
+
+def test_batch_deadline(mock_plantuml):
+    def handler(request):
+        time.sleep(0.05)
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler)
+    results = plantuml.process_many([f"@startuml\nactor Bob{i}\n@enduml" for i in range(8)], max_workers=1, deadline=0.12)
+    timeouts = [content for content, _ in results if isinstance(content, PlantUMLTimeoutError)]
+    assert 0 < len(timeouts) < 8
+
+def test_circuit_breaker(mock_plantuml):
+    handler, calls = flaky([500] * 3)
+    breaker = CircuitBreaker(failure_threshold=0.5, window=4, min_calls=2, reset_timeout=0.05)
+    plantuml = mock_plantuml(handler, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(PlantUMLHTTPError):
+            plantuml.process("@startuml\nactor Bob\n@enduml")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(PlantUMLCircuitOpenError):
+        plantuml.process("@startuml\nactor Bob\n@enduml")
+    assert len(calls) == 2
+    time.sleep(0.06)
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.process("@startuml\nactor Bob\n@enduml")
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert plantuml.process("@startuml\nactor Bob\n@enduml")[0] == b"PNG"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_circuit_breaker_trial_failing_outside_http(mock_plantuml):
+    outcomes = [503, ValueError("broken transport"), 200]
+
+    def handler(request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, content=b"PNG")
+
+    breaker = CircuitBreaker(failure_threshold=0.5, window=2, min_calls=1, reset_timeout=0.01)
+    plantuml = mock_plantuml(handler, circuit_breaker=breaker)
+    with pytest.raises(PlantUMLHTTPError):
+        plantuml.process("@startuml\nactor Bob\n@enduml")
+    time.sleep(0.02)
+    with pytest.raises(ValueError):
+        plantuml.process("@startuml\nactor Bob\n@enduml")
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert plantuml.process("@startuml\nactor Bob\n@enduml")[0] == b"PNG"
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,48 @@
+import threading
+import time
+import httpx
+import pytest
+from plantumlapi.plantumlapi import PlantUMLError, PlantUMLHTTPError
+from plantumlapi.plantumlapi.scheduler import BACKGROUND, INTERACTIVE, RenderScheduler
+
+def make_plantuml(mock_plantuml, order):
+    lock = threading.Lock()
+
+    def handler(request):
+        time.sleep(0.01)
+        with lock:
+            order.append(request.url.path)
+        return httpx.Response(200, content=b"PNG")
+
+    return mock_plantuml(handler)
+
+def test_interactive_not_starved_by_background(mock_plantuml):
+    order = []
+    plantuml = make_plantuml(mock_plantuml, order)
+    with RenderScheduler(plantuml, workers=3, reserved={INTERACTIVE: 1}) as scheduler:
+        background = [scheduler.submit(f"@startuml\nactor Bulk{i}\n@enduml", BACKGROUND) for i in range(60)]
+        time.sleep(0.03)
+        interactive = [scheduler.submit(f"@startuml\nactor Preview{i}\n@enduml", INTERACTIVE) for i in range(5)]
+        for future in interactive:
+            assert future.result()[0] == b"PNG"
+        assert sum(not future.done() for future in background) > 30
+    assert all(future.done() for future in background)
+    stats = scheduler.stats()
+    assert stats[INTERACTIVE]["completed"] == 5 and stats[BACKGROUND]["completed"] == 60
+    assert stats[INTERACTIVE]["queued"] == stats[BACKGROUND]["queued"] == 0
+    assert stats[INTERACTIVE]["wait_p99"] < stats[BACKGROUND]["wait_p99"]
+
+def test_errors_and_validation(mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(400))
+    with pytest.raises(PlantUMLError):
+        RenderScheduler(plantuml, workers=1, reserved={INTERACTIVE: 1})
+    with pytest.raises(PlantUMLError, match="preview"):
+        RenderScheduler(plantuml, workers=2, reserved={"preview": 1})
+    scheduler = RenderScheduler(plantuml, workers=2)
+    with pytest.raises(PlantUMLError):
+        scheduler.submit("@startuml\nactor Bob\n@enduml", "urgent")
+    with pytest.raises(PlantUMLHTTPError):
+        scheduler.process("@startuml\nincorrect input\n@enduml")
+    scheduler.close()
+    with pytest.raises(PlantUMLError):
+        scheduler.submit("@startuml\nactor Bob\n@enduml")
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from plantumlapi.plantumlapi import AsyncPlantUML, PlantUMLHTTPError
+from plantumlapi.plantumlapi.singleflight import AsyncSingleFlight, SingleFlight
+
+def test_single_flight_shares_result():
+    single_flight = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(5)
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"PNG"
+
+    def worker(results):
+        barrier.wait()
+        results.append(single_flight.do("key", fn))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"PNG"] * 5
+    assert len(calls) == 1
+    assert len(single_flight) == 0
+
+def test_single_flight_shares_error():
+    single_flight = SingleFlight()
+
+    def fn():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        single_flight.do("key", fn)
+    assert single_flight.do("key", lambda: 1) == 1
+
+def test_process_coalesces_identical_renders(mock_plantuml):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        time.sleep(0.05)
+        return httpx.Response(200, content=b"PNG")
+
+    plantuml = mock_plantuml(handler, coalesce=True)
+    results = plantuml.process_many(["@startuml\nactor Bob\n@enduml"] * 8 + ["@startuml\nactor Alice\n@enduml"], max_workers=9)
+    assert [content for content, _ in results] == [b"PNG"] * 9
+    assert len(requests) == 2
+
+def test_async_process_coalesces_identical_renders(mock_plantuml):
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        if "svg" in request.url.path:
+            return httpx.Response(400)
+        return httpx.Response(200, content=b"PNG")
+
+    async def main():
+        async with mock_plantuml(handler, client=AsyncPlantUML, coalesce=True) as plantuml:
+            results = await asyncio.gather(*(plantuml.process("@startuml\nactor Bob\n@enduml") for _ in range(10)))
+            errors = await asyncio.gather(*(plantuml.process("@startuml\nactor Bob\n@enduml", format="svg") for _ in range(3)), return_exceptions=True)
+            return results, errors
+
+    results, errors = asyncio.run(main())
+    assert {content for content, _ in results} == {b"PNG"}
+    assert all(isinstance(error, PlantUMLHTTPError) for error in errors)
+    assert len(requests) == 2
+
+def test_async_single_flight_empty_after_call():
+    single_flight = AsyncSingleFlight()
+
+    async def fn():
+        return 1
+
+    assert asyncio.run(single_flight.do("key", fn)) == 1
+    assert len(single_flight) == 0
+
+def test_async_single_flight_leader_cancelled():
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"PNG"
+
+    async def main():
+        leader = asyncio.ensure_future(single_flight.do("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(main()) == b"PNG"
+    assert len(calls) == 1 and len(single_flight) == 0
+
+def test_async_single_flight_all_cancelled():
+    single_flight = AsyncSingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        waiters = [asyncio.ensure_future(single_flight.do("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [1] and len(single_flight) == 0
+
+def test_async_single_flight_caller_after_abandoned_call():
+    single_flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        return b"PNG"
+
+    async def main():
+        leader = asyncio.ensure_future(single_flight.do("key", fn))
+        await asyncio.sleep(0.005)
+        leader.cancel()
+        # scheduled right after the leader gives up, before the call ends
+        late = asyncio.ensure_future(single_flight.do("key", fn))
+        return await late
+
+    assert asyncio.run(main()) == b"PNG"
+    assert len(single_flight) == 0
@@ -0,0 +1,66 @@
+import io
+import os
+import httpx
+from plantumlapi.plantumlapi.encoding import text_from_url
+from plantumlapi.plantumlapi.split import estimate_height, paginate, split_diagrams
+
+MULTI = """' shared header, ignored
+@startuml login
+Bob -> Alice : login
+@enduml
+
+@startuml(id=SECOND)
+skinparam monochrome true
+A -> B
+newpage
+B -> C
+@enduml
+@startmindmap
+* root
+@endmindmap
+"""
+
+def test_split_blocks():
+    diagrams = list(split_diagrams(io.StringIO(MULTI)))
+    assert [(d.index, d.name, d.start, d.end) for d in diagrams] == [(0, "login", 2, 4), (1, "SECOND", 6, 11), (2, None, 12, 14)]
+    assert diagrams[0].text == "@startuml login\nBob -> Alice : login\n@enduml\n"
+    assert diagrams[2].text == "@startmindmap\n* root\n@endmindmap\n"
+
+def test_split_pages():
+    diagrams = list(split_diagrams(io.StringIO(MULTI), pages=True))
+    assert [(d.index, d.page, d.start, d.end) for d in diagrams] == [(0, 0, 2, 4), (1, 0, 6, 8), (1, 1, 10, 11), (2, 0, 12, 14)]
+    assert diagrams[1].text == "@startuml(id=SECOND)\nskinparam monochrome true\nA -> B\n@enduml\n"
+    assert diagrams[2].text == "@startuml(id=SECOND)\nskinparam monochrome true\nB -> C\n@enduml\n"
+
+def test_split_without_start_lines():
+    assert [d.text for d in split_diagrams(["A -> B\n", "B -> C\n"])] == ["A -> B\nB -> C\n"]
+    assert list(split_diagrams(["\n"])) == []
+
+def test_process_blocks(tmp_path, mock_plantuml):
+    source = tmp_path / "seq.puml"
+    source.write_text(MULTI, encoding="utf-8")
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, text=text_from_url(str(request.url))), url="http://plantuml/txt")
+    results = sorted(plantuml.process_blocks(str(source), directory=str(tmp_path), pages=True))
+    assert [(os.path.basename(outfile), error) for _, outfile, error in results] == [("seq-login.txt", None), ("seq-SECOND.txt", None), ("seq-SECOND-1.txt", None), ("seq-2.txt", None)]
+    assert (tmp_path / "seq-SECOND-1.txt").read_text() == "@startuml(id=SECOND)\nskinparam monochrome true\nB -> C\n@enduml\n"
+
+    source.write_text("@startuml\nA -> B\n@enduml\n", encoding="utf-8")
+    [(_, outfile, error)] = plantuml.process_blocks(str(source), directory=str(tmp_path))
+    assert outfile == str(tmp_path / "seq.txt") and error is None
+
+def test_paginate_long_sequence():
+    lines = ["@startuml", "actor Bob"] + [f"Bob -> Alice : m{i}" for i in range(30)] + ["alt retry", "Bob -> Alice", "end", "@enduml", "@startuml", "class A", "@enduml"]
+    assert estimate_height(lines[1:32]) > 400
+    paged = list(paginate(lines, limit=400))
+    assert paged.count("newpage") == 3 and paged[-3:] == ["@startuml", "class A", "@enduml"]
+    pages = [d for d in split_diagrams(paged, pages=True) if d.index == 0]
+    assert len(pages) == 4 and all(d.text.startswith("@startuml\nactor Bob\n") for d in pages)
+    assert all(estimate_height(d.text.splitlines()) <= 400 for d in pages)
+    assert pages[-1].text == "@startuml\nactor Bob\n" + "".join(f"Bob -> Alice : m{i}\n" for i in range(27, 30)) + "alt retry\nBob -> Alice\nend\n@enduml\n"
+    assert list(paginate(lines)) == lines
+
+def test_process_pages(mock_plantuml):
+    plantuml = mock_plantuml(lambda request: httpx.Response(200, text=text_from_url(str(request.url))), url="http://plantuml/txt")
+    text = "\n".join(["@startuml"] + [f"A -> B : {i}" for i in range(20)] + ["@enduml"])
+    results = plantuml.process_pages(text, limit=400)
+    assert [content.decode().count("A -> B") for content, _ in results] == [9, 9, 2]
@@ -0,0 +1,77 @@
+import itertools
+import os
+import time
+from threading import Event
+import httpx
+from plantumlapi.plantumlapi.encoding import text_from_url
+from plantumlapi.plantumlapi.include import IncludeResolver
+from plantumlapi.plantumlapi.watch import TreeWatcher
+
+writes = itertools.count(1)
+
+def write(filename, text):
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(text)
+    # distinct mtimes, quick successive writes can share a filesystem tick
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + next(writes) * 1_000_000_000))
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+def read(filename):
+    try:
+        with open(filename, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def echo_plantuml(mock_plantuml, requests, block=None):
+    def handler(request):
+        text = text_from_url(str(request.url))
+        requests.append(text)
+        if block is not None and text == "A -> B":
+            block.wait(5)
+        return httpx.Response(200, content=text.encode())
+
+    return mock_plantuml(handler, url="http://plantuml/svg")
+
+def test_watch_renders_changes_and_removals(tmp_path, mock_plantuml):
+    source, image = str(tmp_path / "a.puml"), str(tmp_path / "a.svg")
+    write(source, "A -> B")
+    requests = []
+    with TreeWatcher(echo_plantuml(mock_plantuml, requests), str(tmp_path), interval=0.01, debounce=0.05, use_watchdog=False):
+        wait_for(lambda: read(image) == b"A -> B")
+        for i in range(5):
+            write(source, f"A -> C{i}")
+        wait_for(lambda: read(image) == b"A -> C4")
+        os.remove(source)
+        wait_for(lambda: read(image) is None)
+    # the burst of saves is coalesced into a single render
+    assert requests == ["A -> B", "A -> C4"]
+
+def test_watch_discards_stale_renders(tmp_path, mock_plantuml):
+    source, image = str(tmp_path / "a.puml"), str(tmp_path / "a.svg")
+    write(source, "A")
+    block, requests = Event(), []
+    with TreeWatcher(echo_plantuml(mock_plantuml, requests, block), str(tmp_path), interval=0.01, debounce=0.01, use_watchdog=False):
+        wait_for(lambda: read(image) == b"A")
+        write(source, "A -> B")
+        wait_for(lambda: "A -> B" in requests)
+        write(source, "A -> C")
+        wait_for(lambda: read(image) == b"A -> C")
+        block.set()
+        time.sleep(0.1)
+    assert read(image) == b"A -> C"
+
+def test_watch_rerenders_dependents_of_includes(tmp_path, mock_plantuml):
+    write(str(tmp_path / "style.iuml"), "skinparam shadowing false")
+    write(str(tmp_path / "a.puml"), "!include style.iuml\nA -> B")
+    image, requests = str(tmp_path / "a.svg"), []
+    with TreeWatcher(echo_plantuml(mock_plantuml, requests), str(tmp_path), interval=0.01, debounce=0.01, use_watchdog=False, resolver=IncludeResolver()):
+        wait_for(lambda: read(image) == b"skinparam shadowing false\nA -> B")
+        write(str(tmp_path / "style.iuml"), "skinparam shadowing true")
+        wait_for(lambda: read(image) == b"skinparam shadowing true\nA -> B")